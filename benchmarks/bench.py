@@ -0,0 +1,171 @@
+"""
+benchmark of RRP construction (each stage) and the metric functions
+
+python benchmarks/bench.py --T 2000 20000 --N 2 20 --output new.json
+python benchmarks/compare.py old.json new.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import tool9  # noqa: E402
+from tool9 import (RRP, performance, performance1, performance_table,  # noqa
+                   drawdown, maxdrawdown, rolling_sr, rolling_var,
+                   rolling_maxdrawdown, clear_reset_calendar)
+from synthetic import synthetic  # noqa: E402
+
+
+# leverage modes: arguments of RRP
+modes = {
+    'fixed': dict(leverage_fixed=1.5),
+    'target_risk': dict(target_risk=10),
+    'target_return': dict(target_return=0.1),
+    'kelly': dict(usekelly=True),
+}
+
+
+def measure(func, repeat):
+    """
+    return [best seconds of repeat runs, peak bytes of one run]
+    printed messages of func are dropped
+    """
+    seconds = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            seconds.append(time.perf_counter() - start)
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return [min(seconds), peak]
+
+
+def bench_rrp(data, reset_months, repeat):
+    """
+    time and memory of RRP for each leverage mode and get_actual
+    """
+    rows = []
+    for mode, kw in modes.items():
+        for get_actual in (False, True):
+            kw_all = dict(logr=data['logr'], risk=data['risk'],
+                          corr=data['corr'], r_rolling=data['r_rolling'],
+                          rf_rolling=data['rf_rolling'],
+                          reset_months=reset_months, leverage_limit=3,
+                          get_actual=get_actual, **kw)
+            # measure the computation, not the risk_memo shared by runs
+            kw_all['memo'] = False
+            case = {'case': 'RRP', 'mode': mode, 'get_actual': get_actual}
+            seconds, peak = measure(lambda: RRP(**kw_all), repeat)
+            rows.append(dict(case, stage='total', seconds=seconds,
+                             peak_bytes=peak))
+            with contextlib.redirect_stdout(io.StringIO()):
+                p = RRP(**kw_all)
+            for stage, (_, methods) in RRP.stages.items():
+                if stage in RRP.actual_stages and not get_actual:
+                    continue
+
+                def run():
+                    # measure the reset calendar without the shared cache
+                    clear_reset_calendar()
+                    for method in methods:
+                        getattr(p, method)()
+                seconds, peak = measure(run, repeat)
+                rows.append(dict(case, stage=stage, seconds=seconds,
+                                 peak_bytes=peak))
+    return rows
+
+
+def bench_func(data, repeat):
+    """
+    time and memory of the metric functions on the log returns
+    """
+    lr = data['logr']
+    lr0 = lr.iloc[:, 0]
+    lrf = pd.Series(0.0001, index=lr.index)
+    funcs = {
+        'performance': lambda: performance(lr0),
+        'performance1': lambda: performance1(lr0, lrf),
+        'performance_table': lambda: performance_table(lr, lrf),
+        'drawdown': lambda: drawdown(lr0),
+        'maxdrawdown': lambda: maxdrawdown(lr0),
+        'rolling_sr': lambda: rolling_sr(lr, 250),
+        'rolling_var': lambda: rolling_var(lr, 250),
+        'rolling_maxdrawdown': lambda: rolling_maxdrawdown(lr, 250),
+    }
+    rows = []
+    for name, func in funcs.items():
+        seconds, peak = measure(func, repeat)
+        rows.append({'case': 'func', 'stage': name, 'seconds': seconds,
+                     'peak_bytes': peak})
+    return rows
+
+
+def version():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True,
+            text=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except OSError:
+        return ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--T', type=int, nargs='+', default=[2000],
+                        help='number of days')
+    parser.add_argument('--N', type=int, nargs='+', default=[2],
+                        help='number of assets')
+    parser.add_argument('--reset-months', type=int, nargs='+', default=[3])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-func', action='store_true',
+                        help='do not run the metric functions')
+    parser.add_argument('--output', help='json file, default stdout')
+    args = parser.parse_args(argv)
+    results = []
+    for T in args.T:
+        for N in args.N:
+            data = synthetic(T, N, seed=args.seed)
+            size = {'T': T, 'N': N}
+            for reset_months in args.reset_months:
+                for row in bench_rrp(data, reset_months, args.repeat):
+                    results.append(dict(size, reset_months=reset_months,
+                                        **row))
+                print('RRP T={} N={} reset_months={} done'.format(
+                    T, N, reset_months), file=sys.stderr)
+            if not args.skip_func:
+                for row in bench_func(data, args.repeat):
+                    results.append(dict(size, **row))
+    report = {
+        'meta': {'version': version(), 'tool9': tool9.__file__,
+                 'python': platform.python_version(),
+                 'numpy': np.__version__, 'pandas': pd.__version__,
+                 'machine': platform.machine(), 'seed': args.seed,
+                 'repeat': args.repeat,
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    text = json.dumps(report, indent=1)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
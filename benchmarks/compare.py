@@ -0,0 +1,57 @@
+"""
+compare two json results of bench.py
+
+python benchmarks/compare.py old.json new.json [--threshold 1.1]
+"""
+import argparse
+import json
+
+import pandas as pd
+
+# columns that identify one measurement
+keys = ['T', 'N', 'reset_months', 'case', 'mode', 'get_actual', 'stage']
+
+
+def load(path):
+    with open(path) as f:
+        data = pd.DataFrame(json.load(f)['results'])
+    for key in keys:
+        if key not in data:
+            data[key] = None
+    return data.fillna({'reset_months': -1, 'mode': '', 'get_actual': ''}). \
+        set_index(keys)[['seconds', 'peak_bytes']]
+
+
+def compare(old, new):
+    """
+    return pd.DataFrame of the measurements in both, with the ratio
+    new / old of seconds and peak_bytes
+    """
+    table = old.join(new, lsuffix='_old', rsuffix='_new', how='inner')
+    table['time_ratio'] = table['seconds_new'] / table['seconds_old']
+    table['memory_ratio'] = table['peak_bytes_new'] / table['peak_bytes_old']
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='mark the ratios higher than it')
+    args = parser.parse_args(argv)
+    table = compare(load(args.old), load(args.new))
+    slower = ((table['time_ratio'] > args.threshold) |
+              (table['memory_ratio'] > args.threshold))
+    table['regression'] = slower.map({True: '*', False: ''})
+    with pd.option_context('display.max_rows', None,
+                           'display.max_columns', None,
+                           'display.width', 200):
+        print(table[['seconds_old', 'seconds_new', 'time_ratio',
+                     'memory_ratio', 'regression']])
+    print('{} of {} measurements over {}'.format(slower.sum(), len(table),
+                                                 args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+seeded synthetic inputs of RRP
+"""
+import numpy as np
+import pandas as pd
+from tool9 import CorrCube
+
+
+# business days of the index at most, datetime64[ns] ends in 2262
+max_days = 50000
+
+def synthetic(T=2000, N=2, seed=0, start='2000-01-03', corr=True):
+    """
+    random inputs of RRP for T days (bars) and N assets, as a dict:
+      - logr: daily log return, pd.DataFrame (T, N).
+      - risk: yearly volatility in percent, pd.DataFrame (T, N).
+      - corr: CorrCube (T, N, N), None if not corr. it takes T*N*N*8 bytes.
+      - r_rolling, rf_rolling: rolling yearly return of assets and risk-free
+          rate, pd.DataFrame.
+    the same seed gives the same inputs. if T > max_days, each business day
+    has several bars spread over the 6.5 hours from 09:30, so the index
+    stays within the datetime64[ns] range.
+    """
+    rng = np.random.default_rng(seed)
+    index = dates(T, start)
+    names = ['a{}'.format(i) for i in range(N)]
+    # volatility of each asset moves slowly around its own level
+    level = rng.uniform(5, 30, N)
+    shock = rng.normal(0, 0.02, (T, N)).cumsum(axis=0)
+    vol = level*np.exp(shock - shock.mean(axis=0))
+    # one common factor, loadings give the base correlation
+    loading = rng.uniform(0.1, 0.7, N)
+    base = np.outer(loading, loading)
+    np.fill_diagonal(base, 1)
+    z = (rng.standard_normal((T, 1))*loading +
+         rng.standard_normal((T, N))*np.sqrt(1 - loading**2))
+    logr = z*vol/100/np.sqrt(252) + rng.normal(0.0002, 0.0001, N)
+    data = {
+        'logr': pd.DataFrame(logr, index=index, columns=names),
+        'risk': pd.DataFrame(vol, index=index, columns=names),
+        'r_rolling': pd.DataFrame(
+            pd.DataFrame(np.expm1(logr)).rolling(250, min_periods=1).sum()
+            .to_numpy(), index=index, columns=names
+        ),
+        'rf_rolling': pd.DataFrame({'rf': rng.uniform(0, 0.03) +
+                                    np.zeros(T)}, index=index),
+        'corr': None,
+    }
+    if corr:
+        # correlation moves between base and identity
+        weight = 0.5/(1 + np.exp(-rng.normal(0, 0.05, T).cumsum()))
+        values = np.empty((T, N, N))
+        chunk = max(1, 2**22 // max(N*N, 1))
+        for i in range(0, T, chunk):
+            w = weight[i:i+chunk, None, None]
+            values[i:i+chunk] = (1-w)*base + w*np.eye(N)
+        data['corr'] = CorrCube(values, index, names)
+    return data
+
+
+def dates(T, start='2000-01-03'):
+    """
+    T business days, or T intraday bars of ceil(T/max_days) per business day
+    """
+    per_day = -(-T // max_days)
+    if per_day == 1:
+        return pd.bdate_range(start, periods=T)
+    days = pd.bdate_range(start, periods=-(-T // per_day))
+    # 09:30 and equal steps in the 6.5 hours session, in ns
+    offset = 34200*10**9 + np.arange(per_day)*(23400*10**9 // per_day)
+    return pd.DatetimeIndex(
+        (days.asi8[:, None] + offset).ravel()[:T]
+    )
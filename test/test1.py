@@ -2,9 +2,28 @@
 # python -m unittest test/test1
 import unittest
 from pathlib import Path
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import shutil
+import sys
+import tempfile
+import numpy as np
 import pandas as pd
 
-from tool9 import RRP, period, es, performance, portfolio_risk, period_4_plot
+from tool9 import (RRP, rrp_chunked, srm, RiskMemo, cached_result, result_key,
+                   clear_result_cache, describe, describe_frame,
+                   drawdown_episodes, avedrawdown, reset_sensitivity,
+                   bootstrap, bootstrap_index, RRPResult, RRPBatch,
+                   CovEstimator, risk_corr, load_frame, load_corr, period, es,
+                   performance, performance1, performance_table,
+                   portfolio_risk, portfolio_risk_batch, risk_parity_ratio,
+                   period_4_plot, maxdrawdown, segment_cumsum, CorrCube, sr,
+                   var, rolling_sr, rolling_var, rolling_es, rolling_var_es,
+                   rolling_maxdrawdown, param_grid, sweep, reset_calendar)
+import tool9.result_cache
+from tool9.service import RRPService
+from tool9.customized_exceptions import DataFrameError, InputError
 
 
 class TestMonthint(unittest.TestCase):
@@ -45,3 +64,1085 @@ class TestInput(unittest.TestCase):
 
     def tearDown(self):
         return None
+
+
+class TestPortfolioRisk(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+        self.ratio = [0.6, 0.4]
+
+    def test_0(self):
+        dates = self.risk.index[:50]
+        risk_batch = portfolio_risk_batch(
+            array_corr=self.corr.loc[dates].to_numpy().reshape(-1, 2, 2),
+            array_vol=self.risk.loc[dates].to_numpy(),
+            array_ratio=[self.ratio] * len(dates))
+        for i, a_date in enumerate(dates):
+            self.assertAlmostEqual(
+                risk_batch[i],
+                portfolio_risk(data_corr=self.corr.loc[a_date],
+                               data_vol=self.risk.loc[a_date],
+                               data_ratio=self.ratio))
+
+    def tearDown(self):
+        return None
+
+
+class TestCorrCube(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+
+    def test_0(self):
+        cube = CorrCube.from_frame(self.corr)
+        self.assertEqual(cube.shape, (len(self.logr), 2, 2))
+        pd.testing.assert_frame_equal(cube.to_frame(), self.corr,
+                                      check_names=False)
+
+    def test_1(self):
+        cube = CorrCube.from_frame(self.corr, triu=True)
+        a_date = self.logr.index[100]
+        self.assertEqual(cube.values.shape, (len(self.logr), 3))
+        self.assertTrue(
+            (cube[a_date] == self.corr.loc[a_date].to_numpy()).all())
+
+    def test_2(self):
+        kw = dict(logr=self.logr, risk=self.risk, reset_months=6,
+                  target_risk=10, get_actual=True)
+        p_frame = RRP(corr=self.corr, **kw)
+        p_cube = RRP(corr=CorrCube.from_frame(self.corr), **kw)
+        pd.testing.assert_frame_equal(p_frame.risk_p_actual,
+                                      p_cube.risk_p_actual)
+
+    def test_3(self):
+        # the dates looked up before and after append
+        full = CorrCube.from_frame(self.corr)
+        n = 1000
+        cube = CorrCube(full.values[:n], full.index[:n], full.columns)
+        self.assertEqual(cube.offset(full.index[10]), 10)
+        cube.append(full.values[n:], full.index[n:])
+        for i in (10, n, len(full) - 1):
+            self.assertEqual(cube.offset(full.index[i]), i)
+            self.assertTrue((cube[full.index[i]] == full.at(i)).all())
+        self.assertTrue((cube.offsets(full.index[[5, n+5]]) ==
+                         [5, n+5]).all())
+        with self.assertRaises(KeyError):
+            cube.offset('1990-01-01')
+
+    def tearDown(self):
+        return None
+
+
+class TestRiskParityRatio(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        a = rng.normal(size=(20, 10, 30))
+        self.array_cov = a @ a.transpose(0, 2, 1) / 30
+
+    def test_0(self):
+        ratio, info = risk_parity_ratio(self.array_cov)
+        self.assertTrue(info['converged'].all())
+        contribution = ratio * np.einsum('tij,tj->ti', self.array_cov, ratio)
+        contribution = contribution / contribution.sum(axis=1)[:, None]
+        self.assertTrue(np.allclose(contribution, 0.1, atol=1e-8))
+
+    def test_1(self):
+        ratio, info = risk_parity_ratio(self.array_cov)
+        ratio_warm, info_warm = risk_parity_ratio(self.array_cov,
+                                                  warm_start=True)
+        self.assertTrue(np.allclose(ratio, ratio_warm, atol=1e-8))
+        ratio_block, info_block = risk_parity_ratio(
+            self.array_cov, ratio_init=ratio[0], warm_start=True,
+            warm_block=8
+        )
+        self.assertTrue(np.allclose(ratio, ratio_block, atol=1e-8))
+        self.assertEqual(info_block['iterations'][0], 1)
+
+    def test_2(self):
+        # for 2 assets, equal risk contribution is inverse volatility
+        ratio, info = risk_parity_ratio(self.array_cov[:, :2, :2])
+        vol = np.sqrt(np.einsum('tii->ti', self.array_cov[:, :2, :2]))
+        self.assertTrue(np.allclose(
+            ratio, (1/vol) / (1/vol).sum(axis=1)[:, None], atol=1e-8))
+
+    def tearDown(self):
+        return None
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+        self.grid = param_grid(reset_months=[6, 12], leverage_limit=[2, 3])
+
+    def test_0(self):
+        t = sweep(self.grid, self.logr, self.risk, self.corr, processes=0,
+                  target_risk=10)
+        self.assertEqual(len(t), 4)
+        p = RRP(logr=self.logr, risk=self.risk, corr=self.corr,
+                reset_months=12, leverage_limit=3, target_risk=10)
+        self.assertAlmostEqual(
+            t.iloc[3]['MDD'], maxdrawdown(p.logr_p['portfolio']))
+
+    def test_1(self):
+        t0 = sweep(self.grid, self.logr, self.risk, self.corr, processes=0,
+                   target_risk=10)
+        t2 = sweep(self.grid, self.logr, self.risk, self.corr, processes=2,
+                   target_risk=10)
+        pd.testing.assert_frame_equal(t0, t2)
+
+    def tearDown(self):
+        return None
+
+
+class TestRenew(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=6,
+                       target_risk=10, get_actual=True)
+
+    def test_0(self):
+        p = RRP(leverage_limit=3, **self.kw)
+        calls = []
+        p.get_reset_calendar = lambda: calls.append('reset')
+        p.get_ratio = lambda: calls.append('ratio')
+        p.new_leverage_limit(2)
+        self.assertEqual(calls, [])
+        p_new = RRP(leverage_limit=2, **self.kw)
+        pd.testing.assert_frame_equal(p.logr_p, p_new.logr_p)
+        pd.testing.assert_frame_equal(p.risk_p_actual, p_new.risk_p_actual)
+
+    def test_1(self):
+        p = RRP(**dict(self.kw, get_actual=False))
+        self.assertIsNone(p.risk_p_actual)
+        p.new_get_actual(True)
+        p_new = RRP(**self.kw)
+        pd.testing.assert_frame_equal(p.risk_p_actual, p_new.risk_p_actual)
+        p.new_reset_months(12)
+        p_new = RRP(**dict(self.kw, reset_months=12))
+        pd.testing.assert_frame_equal(p.logr_p, p_new.logr_p)
+
+    def test_2(self):
+        # corr changed in place, then given again
+        corr = self.kw['corr'].copy()
+        kw = dict(self.kw, corr=corr, risk_budget=[1, 2], memo=False)
+        p = RRP(**kw)
+        corr.loc[corr.index.get_level_values(1) == 'rs', 'rb'] *= 0.5
+        corr.loc[corr.index.get_level_values(1) == 'rb', 'rs'] *= 0.5
+        p.new_corr(corr)
+        p_new = RRP(**kw)
+        pd.testing.assert_frame_equal(p.leverage, p_new.leverage)
+        pd.testing.assert_frame_equal(p.risk_p_actual, p_new.risk_p_actual)
+
+    def tearDown(self):
+        return None
+
+
+class TestAppend(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.cube = CorrCube.from_frame(corr)
+
+    def test_0(self):
+        for mode in ('after', 'before'):
+            kw = dict(reset_months=1, reset_shift_mode=mode, target_risk=10,
+                      first_reset_date='2007-08-04', get_actual=True)
+            p_full = RRP(logr=self.logr, risk=self.risk, corr=self.cube,
+                         **kw)
+            n = 1900
+            p = RRP(logr=self.logr.iloc[:n], risk=self.risk.iloc[:n],
+                    corr=CorrCube(self.cube.values[:n], self.cube.index[:n],
+                                  self.cube.columns), **kw)
+            for i in range(n, len(self.logr), 70):
+                days = self.logr.index[i:i+70]
+                p.append(self.logr.loc[days], risk=self.risk.loc[days],
+                         corr=self.cube.take(days))
+            self.assertTrue(p.reset_date.equals(p_full.reset_date))
+            pd.testing.assert_frame_equal(p.logr_p, p_full.logr_p,
+                                          check_freq=False)
+            pd.testing.assert_frame_equal(p.risk_p_actual,
+                                          p_full.risk_p_actual,
+                                          check_freq=False)
+        self.assertEqual(len(self.cube), len(self.logr))
+
+    def test_1(self):
+        kw = dict(reset_months=3, target_risk=10, get_actual=True)
+        p_full = RRP(logr=self.logr, risk=self.risk, corr=self.cube, **kw)
+        n = 2000
+        p = RRP(logr=self.logr.iloc[:n], risk=self.risk.iloc[:n],
+                corr=CorrCube(self.cube.values[:n], self.cube.index[:n],
+                              self.cube.columns), **kw)
+        days = self.logr.index[n:]
+        with self.assertRaises(InputError):
+            p.append(self.logr.loc[days])
+        with self.assertRaises(DataFrameError):
+            p.append(self.logr.loc[days], risk=self.risk.loc[days],
+                     corr=self.cube.take(days[1:]))
+        self.assertEqual(len(p.logr), n)
+        self.assertEqual(len(p.corr), n)
+        p.append(self.logr.loc[days], risk=self.risk.loc[days],
+                 corr=self.cube.take(days))
+        pd.testing.assert_frame_equal(p.logr_p, p_full.logr_p,
+                                      check_freq=False)
+
+    def test_2(self):
+        # reset on month ends, 2015-01-31 + 1 month is after 2015-03-02
+        for mode in ('after', 'before'):
+            kw = dict(reset_months=1, reset_shift_mode=mode, target_risk=10,
+                      first_reset_date='2007-08-31', get_actual=True)
+            n = self.logr.index.searchsorted(pd.Timestamp('2015-02-20'))
+            end = self.logr.index.searchsorted(pd.Timestamp('2015-04-10'))
+            p_full = RRP(logr=self.logr.iloc[:end], risk=self.risk.iloc[:end],
+                         corr=CorrCube(self.cube.values[:end],
+                                       self.cube.index[:end],
+                                       self.cube.columns), **kw)
+            p = RRP(logr=self.logr.iloc[:n], risk=self.risk.iloc[:n],
+                    corr=CorrCube(self.cube.values[:n], self.cube.index[:n],
+                                  self.cube.columns), **kw)
+            for i in range(n, end):
+                days = self.logr.index[i:i+1]
+                p.append(self.logr.loc[days], risk=self.risk.loc[days],
+                         corr=self.cube.take(days))
+            self.assertTrue(p.reset_date.equals(p_full.reset_date))
+            pd.testing.assert_frame_equal(p.logr_p, p_full.logr_p,
+                                          check_freq=False)
+            pd.testing.assert_frame_equal(p.risk_p, p_full.risk_p,
+                                          check_freq=False)
+
+    def test_3(self):
+        # outputs are views of buffers, a frame taken before append keeps
+        # its values when old days are computed again ('before' mode)
+        kw = dict(reset_months=1, reset_shift_mode='before', target_risk=10,
+                  first_reset_date='2007-08-31', get_actual=True,
+                  dtype='float32')
+        p_full = RRP(logr=self.logr, risk=self.risk, corr=self.cube, **kw)
+        n = 1950
+        p = RRP(logr=self.logr.iloc[:n], risk=self.risk.iloc[:n],
+                corr=CorrCube(self.cube.values[:n], self.cube.index[:n],
+                              self.cube.columns), **kw)
+        taken = []
+        shared = 0
+        for i in range(n, len(self.logr)):
+            days = self.logr.index[i:i+1]
+            ratio = p.ratio
+            taken.append([ratio, ratio.copy()])
+            p.append(self.logr.loc[days], risk=self.risk.loc[days],
+                     corr=self.cube.take(days))
+            shared += np.shares_memory(ratio.to_numpy(), p.ratio.to_numpy())
+        self.assertGreater(shared, 100)
+        for ratio, copy in taken:
+            pd.testing.assert_frame_equal(ratio, copy)
+        for name in ('ratio', 'leverage', 'logr_p', 'ratio_actual',
+                     'risk_p', 'risk_p_actual'):
+            pd.testing.assert_frame_equal(getattr(p, name),
+                                          getattr(p_full, name),
+                                          check_freq=False)
+
+    def tearDown(self):
+        return None
+
+
+class TestCompact(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=3,
+                       target_risk=10)
+
+    def test_0(self):
+        p = RRP(**self.kw)
+        p_compact = RRP(compact=True, **self.kw)
+        self.assertEqual(p_compact.memory_usage()['r_actual_cum'], 0)
+        self.assertLess(p_compact.memory_usage().sum(),
+                        p.memory_usage().sum())
+        # intermediates are computed again when needed
+        p.new_get_actual(True)
+        p_compact.new_get_actual(True)
+        pd.testing.assert_frame_equal(p.ratio_actual, p_compact.ratio_actual)
+
+    def test_1(self):
+        p = RRP(dtype='float32', **self.kw)
+        self.assertTrue((p.logr_p.dtypes == np.float32).all())
+        result = p.result(dtype='float32')
+        self.assertIsInstance(result, RRPResult)
+        self.assertFalse(hasattr(result, '__dict__'))
+        self.assertTrue(np.allclose(result.frame('logr_p'), p.logr_p,
+                                    equal_nan=True))
+
+    def tearDown(self):
+        return None
+
+
+class TestProfile(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=3,
+                       target_risk=10)
+
+    def test_0(self):
+        self.assertEqual(RRP(**self.kw).stage_stats, {})
+        records = []
+        p = RRP(profile=True,
+                profile_callback=lambda stage, record: records.append(stage),
+                **self.kw)
+        self.assertEqual(records, ['reset', 'ratio', 'leverage', 'logr_p'])
+        self.assertGreater(p.stage_stats['logr_p']['peak_bytes'], 0)
+        p.new_target_risk(8)
+        self.assertEqual(p.stage_stats['leverage']['calls'], 2)
+        self.assertEqual(p.stage_stats['ratio']['calls'], 1)
+
+    def tearDown(self):
+        return None
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=2,
+                       first_reset_date='2007-08-04', get_actual=True)
+        self.specs = [{'ratio_fixed': [0.6, 0.4]},
+                      {'ratio_fixed': [0.3, 0.7], 'leverage_fixed': 2},
+                      {'ratio_fixed': [0.5, 0.5], 'target_risk': 10,
+                       'leverage_limit': 3}]
+
+    def test_0(self):
+        b = RRPBatch(self.specs, **self.kw)
+        for i, spec in enumerate(self.specs):
+            p = RRP(**spec, **self.kw)
+            self.assertTrue(np.allclose(b.frame('logr_p')[i],
+                                        p.logr_p['portfolio'],
+                                        equal_nan=True))
+            self.assertTrue(np.allclose(b.frame('risk_p_actual')[i],
+                                        p.risk_p_actual['portfolio'],
+                                        equal_nan=True))
+            self.assertTrue(np.allclose(b.ratio_actual[i], p.ratio_actual,
+                                        equal_nan=True))
+
+    def tearDown(self):
+        return None
+
+
+class TestResetCalendar(unittest.TestCase):
+
+    def setUp(self):
+        self.index = pd.bdate_range('2010-01-01', '2012-12-31')
+
+    def test_0(self):
+        calendar = reset_calendar(self.index, pd.to_datetime('2010-01-03'),
+                                  6, 'after')
+        self.assertEqual(list(calendar['reset_date'].strftime('%Y-%m-%d')),
+                         ['2010-01-01', '2010-01-04', '2010-07-05',
+                          '2011-01-03', '2011-07-04', '2012-01-03',
+                          '2012-07-03'])
+        period = calendar['reset_period']
+        self.assertEqual(period[0], 0)
+        self.assertEqual(period[1], 1)
+        self.assertEqual(period[-1], 6)
+
+    def test_1(self):
+        calendar = reset_calendar(self.index, pd.to_datetime('2010-01-03'),
+                                  6, 'before')
+        self.assertEqual(calendar['reset_date'][2],
+                         pd.to_datetime('2010-07-02'))
+        self.assertIs(calendar, reset_calendar(self.index.copy(),
+                                               '2010-01-03', 6, 'b'))
+
+    def test_2(self):
+        # the cache is shared by threads, e.g. the executor of RRPService
+        dates = self.index[:300]
+        expected = [reset_calendar(self.index, date, 3)['reset_position']
+                    for date in dates]
+        with ThreadPoolExecutor(8) as pool:
+            for _ in range(3):
+                found = pool.map(lambda date: reset_calendar(
+                    self.index, date, 3)['reset_position'], dates)
+                for a, b in zip(found, expected):
+                    self.assertTrue((a == b).all())
+
+    def tearDown(self):
+        return None
+
+
+class TestSegmentCumsum(unittest.TestCase):
+
+    def test_0(self):
+        rng = np.random.default_rng(0)
+        data = rng.normal(size=(300, 3))
+        data[rng.random(data.shape) < 0.1] = np.nan
+        starts = [0, 40, 41, 200]
+        period = np.searchsorted(starts, np.arange(300), side='right') - 1
+        expected = pd.DataFrame(data).groupby(period).cumsum().to_numpy()
+        self.assertTrue(np.allclose(segment_cumsum(data, starts), expected,
+                                    equal_nan=True))
+
+    def test_1(self):
+        data = np.ones((5, 2))
+        result = segment_cumsum(data, [3], initial=[10, 20], out=data)
+        self.assertIs(result, data)
+        self.assertEqual(result[:, 1].tolist(), [21, 22, 23, 1, 2])
+
+
+class TestPerformanceTable(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.data = pd.read_csv(test_data_path / 'dataset3.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.data.iloc[:30, 0] = np.nan
+
+    def test_0(self):
+        t = performance_table(self.data[['rs', 'rb']], self.data['rf'])
+        for col in ['rs', 'rb']:
+            expected = performance1(self.data[col], self.data['rf'])
+            self.assertTrue(np.allclose(t.loc[col], expected.iloc[0]))
+
+    def test_1(self):
+        t = performance_table(self.data[['rs', 'rb']])
+        for col in ['rs', 'rb']:
+            expected = performance(self.data[col])
+            self.assertTrue(np.allclose(t.loc[col], expected.iloc[0]))
+
+    def tearDown(self):
+        return None
+
+
+class TestRolling(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.data = pd.read_csv(test_data_path / 'dataset3.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.data = self.data[['rs', 'rb']].iloc[:400]
+        self.data.iloc[100:120, 1] = np.nan
+
+    def test_0(self):
+        window = self.data.rolling(60)
+        checks = [(rolling_sr, sr), (rolling_var, var), (rolling_es, es),
+                  (rolling_maxdrawdown, maxdrawdown)]
+        for fast, slow in checks:
+            result = fast(self.data, 60)
+            expected = window.apply(lambda x: slow(pd.Series(x)), raw=False)
+            self.assertTrue(np.allclose(result, expected, equal_nan=True))
+
+    def test_1(self):
+        result = rolling_maxdrawdown(self.data['rb'], 60, min_periods=10)
+        expected = self.data['rb'].rolling(60, min_periods=10).apply(
+            lambda x: maxdrawdown(pd.Series(x)), raw=False)
+        self.assertTrue(np.allclose(result, expected, equal_nan=True))
+
+    def test_2(self):
+        # small chunks, windows at the beginning and with missing values
+        result = rolling_var_es(self.data, 60, min_periods=10, chunk=500)
+        window = self.data.rolling(60, min_periods=10)
+        for fast, slow in zip(result, (var, es)):
+            expected = window.apply(lambda x: slow(pd.Series(x)), raw=False)
+            self.assertTrue(np.allclose(fast, expected, equal_nan=True))
+
+    def tearDown(self):
+        return None
+
+
+class TestEstimators(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+
+    def test_0(self):
+        risk, corr, estimator = risk_corr(self.logr, window=250, scale=1,
+                                          periods=1)
+        self.assertTrue(np.allclose(risk, self.logr.rolling(250).std(),
+                                    equal_nan=True))
+        self.assertTrue(np.allclose(corr.to_frame(),
+                                    self.logr.rolling(250).corr(),
+                                    equal_nan=True))
+        self.assertIsInstance(estimator, CovEstimator)
+
+    def test_1(self):
+        risk, corr, _ = risk_corr(self.logr, halflife=30, scale=1, periods=1)
+        expected = self.logr.ewm(halflife=30, adjust=False).corr()
+        self.assertTrue(np.allclose(corr.values[5:],
+                                    expected.to_numpy()[10:].reshape(-1, 2, 2),
+                                    equal_nan=True))
+        # go on from the estimator of the first days
+        risk_0, _, estimator = risk_corr(self.logr.iloc[:1000], halflife=30)
+        risk_1, _, _ = risk_corr(self.logr.iloc[1000:], estimator=estimator)
+        risk_all, _, _ = risk_corr(self.logr, halflife=30)
+        self.assertTrue(np.allclose(pd.concat([risk_0, risk_1]), risk_all,
+                                    equal_nan=True))
+
+    def tearDown(self):
+        return None
+
+
+class TestLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.test_data_path = Path('test_data/')
+        self.cache_dir = tempfile.mkdtemp()
+
+    def test_0(self):
+        path = self.test_data_path / 'testdata-logr.csv'
+        expected = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+        for _ in range(2):
+            logr = load_frame(path, cache_dir=self.cache_dir)
+            pd.testing.assert_frame_equal(logr, expected)
+        path = self.test_data_path / 'testdata-corr.csv'
+        expected = pd.read_csv(path, parse_dates=['Date'], index_col=[0, 1])
+        corr = load_corr(path, cache_dir=self.cache_dir)
+        self.assertTrue(np.array_equal(corr.to_frame(), expected))
+
+    def test_1(self):
+        # the cache is built again when the csv changes
+        path = Path(self.cache_dir) / 'risk.csv'
+        shutil.copy(self.test_data_path / 'testdata-risk.csv', path)
+        self.assertEqual(len(load_frame(path)), 2104)
+        with open(path, 'a') as f:
+            f.write('2016-01-05,1,2\n')
+        self.assertEqual(load_frame(path).iloc[-1].tolist(), [1, 2])
+
+    def test_2(self):
+        # a cache_dir that can not be created, the csv is parsed anyway
+        blocked = Path(self.cache_dir) / 'file'
+        blocked.write_text('')
+        path = self.test_data_path / 'testdata-corr.csv'
+        corr = load_corr(path, cache_dir=blocked / 'cache')
+        expected = pd.read_csv(path, parse_dates=['Date'], index_col=[0, 1])
+        self.assertTrue(np.array_equal(corr.to_frame(), expected))
+        path = self.test_data_path / 'testdata-risk.csv'
+        risk = load_frame(path, cache_dir=blocked / 'cache')
+        expected = pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+        pd.testing.assert_frame_equal(risk, expected)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+class TestBootstrap(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+
+    def test_0(self):
+        index = bootstrap_index(100, 5, block=10, method='block', seed=0)
+        self.assertEqual(index.shape, (5, 100))
+        # moving blocks of 10 days
+        self.assertTrue((np.diff(index.reshape(5, 10, 10), axis=2) == 1)
+                        .all())
+
+    def test_1(self):
+        kw = dict(n_paths=20, risk=self.risk, corr=self.corr, seed=1,
+                  reset_months=3, target_risk=10, leverage_limit=3)
+        intervals, metrics = bootstrap(self.logr, **kw)
+        self.assertEqual(len(metrics), 20)
+        self.assertTrue((intervals['lower'] <= intervals['upper']).all())
+        # the same paths, computed in smaller chunks
+        _, metrics_small = bootstrap(self.logr, memory=2**20, **kw)
+        pd.testing.assert_frame_equal(metrics, metrics_small)
+
+    def test_2(self):
+        kw = dict(n_paths=3, risk=self.risk, corr=self.corr, seed=1,
+                  ratio_fixed=[0.5, 0.5], reset_months=12)
+        _, metrics = bootstrap(self.logr, leverage_fixed=1, **kw)
+        self.assertFalse(metrics['out of money'].any())
+        _, metrics = bootstrap(self.logr, leverage_fixed=20, **kw)
+        self.assertTrue(metrics['out of money'].all())
+
+    def test_3(self):
+        # one block of all days, every path is the sample
+        for budget in (None, [1, 2]):
+            kw = dict(risk=self.risk, corr=self.corr, reset_months=3,
+                      target_risk=10, leverage_limit=3, risk_budget=budget)
+            p = RRP(logr=self.logr, **kw)
+            expected = performance_table(p.logr_p, np.zeros(len(self.logr)))
+            _, metrics = bootstrap(self.logr, n_paths=2, seed=0,
+                                   block=len(self.logr), method='block', **kw)
+            for i in range(2):
+                self.assertTrue(np.allclose(
+                    metrics.drop(columns='out of money').iloc[i],
+                    expected.iloc[0], equal_nan=True
+                ))
+
+    def tearDown(self):
+        return None
+
+
+class TestResetSensitivity(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=3,
+                       target_risk=10, leverage_limit=3)
+
+    def test_0(self):
+        logr_p, metrics = reset_sensitivity(**self.kw)
+        self.assertEqual(len(metrics), logr_p.shape[1])
+        self.assertEqual(logr_p.shape[1], 64)
+        for first_reset_date in logr_p.columns[::20]:
+            p = RRP(first_reset_date=first_reset_date, **self.kw)
+            self.assertTrue(np.allclose(logr_p[first_reset_date],
+                                        p.logr_p['portfolio'],
+                                        equal_nan=True))
+            self.assertEqual(metrics.loc[first_reset_date, 'out of money'],
+                             p.out_of_money)
+
+    def test_1(self):
+        kw = dict(self.kw, leverage_fixed=20)
+        del kw['target_risk'], kw['leverage_limit']
+        dates = kw['logr'].index[[0, 30]]
+        _, metrics = reset_sensitivity(first_reset_dates=dates, **kw)
+        self.assertTrue(metrics['out of money'].all())
+
+    def tearDown(self):
+        return None
+
+
+class TestDrawdownEpisodes(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.data = pd.read_csv(test_data_path / 'dataset3.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.data = self.data[['rs', 'rb']]
+        self.data.iloc[100:120, 1] = np.nan
+
+    def test_0(self):
+        episodes, summary = drawdown_episodes(self.data)
+        for col in ['rs', 'rb']:
+            self.assertTrue(np.isclose(summary.loc[col, 'MDD'],
+                                       maxdrawdown(self.data[col])))
+            self.assertTrue(np.isclose(summary.loc[col, 'Avg.  DD'],
+                                       avedrawdown(self.data[col])))
+            one = episodes[episodes['column'] == col]
+            self.assertEqual(len(one), summary.loc[col, 'episodes'])
+            self.assertTrue(np.isclose(one['depth'].min(),
+                                       summary.loc[col, 'MDD']))
+
+    def test_1(self):
+        lr = pd.Series([0.1, -0.1, -0.1, 0.3, -0.2, np.nan, 0.1])
+        episodes, _ = drawdown_episodes(lr)
+        self.assertEqual(episodes['peak'].tolist(), [0, 3])
+        self.assertEqual(episodes['trough'].tolist(), [2, 4])
+        self.assertEqual(episodes['recovery'].iloc[0], 3)
+        self.assertTrue(np.isnan(episodes['recovery'].iloc[1]))
+        self.assertEqual(episodes['duration'].tolist(), [3, 3])
+
+    def tearDown(self):
+        return None
+
+
+class TestDescribeFrame(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.data = pd.read_csv(test_data_path / 'dataset3.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.data.iloc[:30, 0] = np.nan
+        self.data.iloc[500:520, 1] = np.nan
+
+    def test_0(self):
+        t = describe_frame(self.data, lags=(1, 5, 10, 20, 250))
+        for col in self.data.columns:
+            expected = describe(col, self.data)
+            self.assertTrue(np.allclose(t.loc[col, expected.columns]
+                                        .to_numpy(dtype=float),
+                                        expected.iloc[0]))
+            self.assertTrue(np.isclose(t.loc[col, 'acf lag=250'],
+                                       self.data[col].autocorr(250)))
+            self.assertEqual([t.loc[col, 'start'], t.loc[col, 'end']],
+                             period(col, self.data))
+
+    def tearDown(self):
+        return None
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.dir = tempfile.mkdtemp()
+        self.logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+        # the last 5 days are pushed to the service
+        self.inputs = {}
+        for name, frame in (('logr', self.logr), ('risk', self.risk),
+                            ('corr', self.corr)):
+            path = str(Path(self.dir) / (name + '.csv'))
+            frame.iloc[:-5*len(self.logr.columns) if name == 'corr' else
+                       -5].to_csv(path)
+            self.inputs[name] = path
+        self.params = dict(reset_months=3, target_risk=10, leverage_limit=3,
+                           get_actual=True)
+
+    def test_0(self):
+        service = RRPService()
+        answer = service.handle({'op': 'load', 'name': 'a',
+                                 'inputs': self.inputs,
+                                 'params': self.params})
+        self.assertTrue(answer['ok'])
+        new = self.logr.index[-5:]
+        push = {
+            'op': 'push', 'name': 'a', 'index': [str(d) for d in new],
+            'logr': self.logr.iloc[-5:].values.tolist(),
+            'risk': self.risk.iloc[-5:].values.tolist(),
+            'corr': self.corr.loc[new].values.reshape(5, 2, 2).tolist()
+        }
+        # bad pushes are refused and the portfolio is not changed
+        for bad in ({'corr': None}, {'risk': push['risk'][:4]}):
+            message = {key: value for key, value in
+                       dict(push, **bad).items() if value is not None}
+            answer = service.handle(message)
+            self.assertFalse(answer['ok'])
+            self.assertEqual(len(service.portfolios['a'].logr),
+                             len(self.logr) - 5)
+        answer = service.handle(push)
+        self.assertTrue(answer['ok'])
+        p = RRP(logr=self.logr, risk=self.risk, corr=self.corr,
+                **self.params)
+        answer = service.handle({'op': 'get', 'name': 'a',
+                                 'output': 'risk_p_actual', 'last': 5})
+        self.assertTrue(np.allclose(answer['result']['data'],
+                                    p.risk_p_actual.iloc[-5:]))
+        answer = service.handle({'op': 'whatif', 'name': 'a',
+                                 'params': {'target_risk': 5}})
+        q = RRP(logr=self.logr, risk=self.risk, corr=self.corr,
+                **dict(self.params, target_risk=5))
+        self.assertTrue(np.isclose(answer['result']['leverage'],
+                                   q.leverage['leverage'].iloc[-1]))
+        answer = service.handle({'op': 'get', 'name': 'b',
+                                 'output': 'leverage'})
+        self.assertFalse(answer['ok'])
+
+    def test_1(self):
+        # two clients at the same time through a Unix socket
+        path = str(Path(self.dir) / 'tool9.sock')
+
+        async def client(message):
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(json.dumps(message).encode() + b'\n')
+            answer = json.loads(await reader.readline())
+            writer.close()
+            return answer
+
+        async def run():
+            service = RRPService()
+            server = await service.start(path=path)
+            async with server:
+                await client({'op': 'load', 'name': 'a',
+                              'inputs': self.inputs, 'params': self.params})
+                return await asyncio.gather(
+                    client({'op': 'get', 'name': 'a', 'output': 'leverage'}),
+                    client({'op': 'performance', 'name': 'a'}),
+                    client({'op': 'list'})
+                )
+
+        leverage, performance, names = asyncio.run(run())
+        self.assertTrue(leverage['ok'] and performance['ok'])
+        self.assertEqual(list(names['result']), ['a'])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        self.cache_dir = tempfile.mkdtemp()
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=3,
+                       target_risk=10, leverage_limit=3, get_actual=True)
+
+    def test_0(self):
+        result, hit = cached_result(self.cache_dir, **self.kw)
+        self.assertFalse(hit)
+        result, hit = cached_result(self.cache_dir, **self.kw)
+        self.assertTrue(hit)
+        p = RRP(**self.kw)
+        for name in ['logr_p', 'ratio', 'leverage', 'ratio_actual',
+                     'risk_p', 'risk_p_actual']:
+            self.assertTrue(np.allclose(result.frame(name), getattr(p, name),
+                                        equal_nan=True))
+        # keyed by values, not by objects
+        kw = dict(self.kw, logr=self.kw['logr'].copy())
+        self.assertEqual(result_key(**kw), result_key(**self.kw))
+        kw['logr'].iloc[5, 0] += 1e-9
+        self.assertNotEqual(result_key(**kw), result_key(**self.kw))
+
+    def test_1(self):
+        # only the last used result is kept in a small cache
+        for target_risk in [8, 9, 10]:
+            cached_result(self.cache_dir, max_bytes=1,
+                          **dict(self.kw, target_risk=target_risk))
+        entries = [p for p in Path(self.cache_dir).iterdir() if p.is_dir()]
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(cached_result(self.cache_dir, **self.kw)[1])
+
+    def test_2(self):
+        # the default directory can be moved
+        default = tool9.result_cache.result_cache_dir
+        tool9.result_cache.result_cache_dir = self.cache_dir
+        try:
+            self.assertFalse(cached_result(**self.kw)[1])
+            self.assertTrue(cached_result(self.cache_dir, **self.kw)[1])
+            clear_result_cache()
+            self.assertFalse(cached_result(self.cache_dir, **self.kw)[1])
+        finally:
+            tool9.result_cache.result_cache_dir = default
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+class TestRiskMemo(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=self.risk, corr=corr, reset_months=3,
+                       get_actual=True)
+        self.memo = RiskMemo()
+
+    def test_0(self):
+        for target_risk in [8, 10]:
+            p = RRP(target_risk=target_risk, memo=self.memo, **self.kw)
+            q = RRP(target_risk=target_risk, memo=False, **self.kw)
+            for name in ['leverage', 'risk_p', 'risk_p_actual']:
+                pd.testing.assert_frame_equal(getattr(p, name),
+                                              getattr(q, name))
+        stats = self.memo.stats()
+        # leverage of the first portfolio computes, all others hit
+        n_reset = len(p.reset_date)
+        self.assertEqual(stats.loc['risk', 'misses'], n_reset)
+        self.assertEqual(stats.loc['risk', 'hits'], 3*n_reset)
+        self.memo.invalidate(self.risk)
+        self.assertEqual(self.memo.stats().loc['risk', 'entries'], 0)
+
+    def test_1(self):
+        memo = RiskMemo(max_cov_bytes=10*8*4, max_risk=10)
+        p = RRP(target_risk=10, risk_budget=[1, 2], memo=memo, **self.kw)
+        stats = memo.stats()
+        self.assertEqual(stats.loc['risk', 'entries'], 10)
+        self.assertEqual(stats.loc['cov', 'entries'], 10)
+        self.assertEqual(stats.loc['cov', 'misses'], len(p.reset_date))
+
+    def test_2(self):
+        # risk changed in place is not mixed up with the old values
+        risk = self.risk.copy()
+        kw = dict(self.kw, risk=risk, target_risk=10, risk_budget=[1, 2])
+        p = RRP(memo=self.memo, **kw)
+        risk.iloc[:, 0] *= 2
+        q = RRP(memo=self.memo, **kw)
+        expected = RRP(**dict(kw, memo=False))
+        p.new_risk(risk)
+        for portfolio in (p, q):
+            for name in ['ratio', 'leverage', 'risk_p']:
+                pd.testing.assert_frame_equal(getattr(portfolio, name),
+                                              getattr(expected, name))
+
+    def tearDown(self):
+        return None
+
+
+class TestChunked(unittest.TestCase):
+
+    def setUp(self):
+        self.test_data_path = Path('test_data/')
+        self.dir = tempfile.mkdtemp()
+        self.logr = pd.read_csv(self.test_data_path / 'testdata-logr.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.risk = pd.read_csv(self.test_data_path / 'testdata-risk.csv',
+                                parse_dates=['Date'], index_col='Date')
+        self.corr = pd.read_csv(self.test_data_path / 'testdata-corr.csv',
+                                parse_dates=['Date'], index_col=[0, 1])
+
+    def test_0(self):
+        kw = dict(first_reset_date='2007-08-04', reset_months=1,
+                  reset_shift_mode='before', target_risk=8,
+                  leverage_limit=3, get_actual=True)
+        p = RRP(logr=self.logr, risk=self.risk, corr=self.corr, **kw)
+        # csv inputs are memory-mapped from the cache
+        paths = {name: self.test_data_path / 'testdata-{}.csv'.format(name)
+                 for name in ['logr', 'risk', 'corr']}
+        result = rrp_chunked(Path(self.dir) / 'out', cache_dir=self.dir,
+                             **paths, **kw)
+        self.assertTrue(result.reset_date.equals(p.reset_date))
+        for name in ['logr_p', 'ratio', 'leverage', 'ratio_actual',
+                     'risk_p', 'risk_p_actual']:
+            self.assertTrue(np.allclose(result.frame(name), getattr(p, name),
+                                        equal_nan=True))
+        self.assertIsInstance(result.logr_p, np.memmap)
+
+    def test_1(self):
+        lr = self.logr['rs']
+        self.assertTrue(np.isclose(sr(lr, periods=12), srm(lr)))
+        metrics = performance1(lr, lr*0, periods=12)
+        self.assertTrue(np.isclose(metrics['Sharpe ratio'].iloc[0],
+                                   srm(lr)))
+        # one reset only if the first reset date is the last day
+        calendar = reset_calendar(self.logr.index, self.logr.index[-1], 3)
+        self.assertEqual(calendar['reset_times'], 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+class TestLeverageGrid(unittest.TestCase):
+
+    def setUp(self):
+        test_data_path = Path('test_data/')
+        logr = pd.read_csv(test_data_path / 'testdata-logr.csv',
+                           parse_dates=['Date'], index_col='Date')
+        risk = pd.read_csv(test_data_path / 'testdata-risk.csv',
+                           parse_dates=['Date'], index_col='Date')
+        corr = pd.read_csv(test_data_path / 'testdata-corr.csv',
+                           parse_dates=['Date'], index_col=[0, 1])
+        self.kw = dict(logr=logr, risk=risk, corr=corr, reset_months=6,
+                       first_reset_date='2007-08-07')
+        self.p = RRP(target_risk=10, leverage_limit=3, **self.kw)
+
+    def test_0(self):
+        logr_p, grid = self.p.leverage_grid(leverage_fixed=[0.5, 2, 80],
+                                            leverage_limit=100)
+        self.assertEqual(grid['out of money'].tolist(), [False, False, True])
+        for i in [0, 1]:
+            q = RRP(leverage_fixed=grid.loc[i, 'leverage_fixed'], **self.kw)
+            self.assertTrue(np.allclose(logr_p[i], q.logr_p['portfolio'],
+                                        equal_nan=True))
+
+    def test_1(self):
+        logr_p, grid = self.p.leverage_grid(target_risk=[5, 10, 15],
+                                            leverage_limit=[2, 3, 4])
+        for i in range(3):
+            q = RRP(target_risk=grid.loc[i, 'target_risk'],
+                    leverage_limit=grid.loc[i, 'leverage_limit'], **self.kw)
+            self.assertTrue(np.allclose(logr_p[i], q.logr_p['portfolio'],
+                                        equal_nan=True))
+        # the leverage setting of the portfolio
+        logr_p, grid = self.p.leverage_grid()
+        self.assertTrue(np.allclose(logr_p[0], self.p.logr_p['portfolio'],
+                                    equal_nan=True))
+
+    def test_2(self):
+        # np.ndarray settings, the limit is broadcast
+        logr_p, grid = self.p.leverage_grid(
+            target_risk=np.array([5., 10.]),
+            leverage_limit=np.array([1.5, 2.])
+        )
+        self.assertEqual(grid['leverage_limit'].tolist(), [1.5, 2.])
+        for i in range(2):
+            q = RRP(target_risk=grid.loc[i, 'target_risk'],
+                    leverage_limit=grid.loc[i, 'leverage_limit'], **self.kw)
+            self.assertTrue(np.allclose(logr_p[i], q.logr_p['portfolio'],
+                                        equal_nan=True))
+        logr_p, grid = self.p.leverage_grid(
+            leverage_fixed=np.array([1., 3.]), leverage_limit=np.array(2.)
+        )
+        self.assertEqual(grid['leverage_limit'].tolist(), [2., 2.])
+
+    def tearDown(self):
+        return None
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        sys.path.insert(0, str(Path('benchmarks').resolve()))
+        from synthetic import synthetic
+        self.synthetic = synthetic
+
+    def test_0(self):
+        # more bars than business days before 2262
+        data = self.synthetic(120000, 2, corr=False)
+        index = data['logr'].index
+        self.assertEqual(len(index), 120000)
+        self.assertTrue(index.is_unique and index.is_monotonic_increasing)
+        self.assertIsNone(data['corr'])
+        self.assertEqual(data['risk'].shape, (120000, 2))
+        # business days as before
+        index = self.synthetic(2000, 2, corr=False)['logr'].index
+        self.assertTrue(index.equals(pd.bdate_range('2000-01-03',
+                                                    periods=2000)))
+
+    def tearDown(self):
+        sys.path.remove(str(Path('benchmarks').resolve()))
+        return None
@@ -9,13 +9,40 @@ provides
 ------
 classes
   - RRP: construct a risk parity portfolio.
+  - CorrCube: correlation between assets, backed by one np.ndarray.
+  - RRPResult: the outputs of a RRP in compact np.ndarray.
+  - RRPBatch: construct many fixed ratio portfolios at once.
+  - CovEstimator: rolling or EWMA covariance, updated one day at a time.
+  - RiskMemo: memo of covariance and portfolio risk shared by RRP.
 functions
   - period: return the effective date period of one column
   - describe: return basic statistical descriptions
+  - sweep: run RRP over a grid of arguments in worker processes
+  - risk_corr: estimate risk and corr of RRP from logr
+  - reset_sensitivity: RRP with every phase offset of the reset calendar
+  - bootstrap: performance distribution of RRP on resampled paths
+  - load_frame, load_corr: load csv inputs through a memory-mapped cache
+  - cached_result: RRP outputs kept in an on-disk cache of results
+  - rrp_chunked: RRP one reset period at a time, outputs written to disk
   - and so on
+modules
+  - tool9.service: a local service keeping RRP instances in memory
 
 """
 
 # import classes and functions
 from .class_rrp import RRP
+from .class_corr import CorrCube
+from .class_batch import RRPBatch
+from .class_result import RRPResult
+from .class_estimator import CovEstimator
+from .class_memo import RiskMemo, risk_memo
+from .estimators import risk_corr, rolling_return
+from .loader import load_frame, load_corr, clear_cache
+from .result_cache import cached_result, result_key, clear_result_cache
+from .chunked import rrp_chunked
+from .bootstrap import bootstrap_index, bootstrap
+from .sensitivity import reset_sensitivity
+from .sweep import param_grid, isweep, sweep
+from .reset_calendar import reset_calendar, clear_reset_calendar
 from .func import *
@@ -0,0 +1,234 @@
+__all__ = ['bootstrap_index', 'bootstrap']
+
+
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from .class_rrp import RRP
+from .class_corr import CorrCube
+from .func import (performance_table, portfolio_risk_batch,
+                   risk_parity_ratio, segment_cumsum)
+from .customized_exceptions import InputError
+
+
+# number of paths drawn from one seed, results do not depend on how the
+# paths are split between chunks and processes
+paths_per_seed = 64
+
+# inputs of the current process, set by bootstrap or _init_worker
+_worker = {}
+# settings of RRP used by the paths
+settings = ('ratio_fixed', 'risk_budget', 'target_risk', 'target_return',
+            'leverage_fixed', 'usekelly', 'leverage_limit', 'dtype')
+
+
+def bootstrap_index(T, n_paths, block=20, method='stationary', seed=None):
+    """
+    row positions of resampled paths of T days, np.ndarray (n_paths, T)
+      - block: (mean) length of blocks in days.
+      - method: 'stationary': blocks of random length, mean block
+          (Politis and Romano). 'circular': blocks of length block, wrap
+          around the end. 'block': moving blocks of length block, not wrap.
+      - seed: seed of np.random.default_rng.
+    all paths are drawn at once.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(T)
+    if method == 'stationary':
+        new = rng.random((n_paths, T)) < 1/block
+        new[:, 0] = True
+    elif method in ('circular', 'block'):
+        new = np.broadcast_to(t % block == 0, (n_paths, T))
+    else:
+        raise ValueError('"method" should be "stationary", "circular" or '
+                         '"block"')
+    high = T - block + 1 if method == 'block' else T
+    if high < 1:
+        raise InputError('"block" is longer than the sample')
+    start = rng.integers(0, high, (n_paths, T))
+    # the day each block begins, and the row it begins from
+    begin = np.maximum.accumulate(np.where(new, t, 0), axis=1)
+    first_row = np.take_along_axis(start, begin, axis=1)
+    return (first_row + t - begin) % T
+
+
+def bootstrap(logr, n_paths=1000, block=20, method='stationary', risk=None,
+              corr=None, r_rolling=None, rf_rolling=None, lrf=None,
+              seed=None, level=0.95, memory=2**28, processes=0, **kw):
+    """
+    performance1 of RRP on resampled paths of the inputs
+      - logr, risk, corr, r_rolling, rf_rolling: inputs of RRP. the same
+          rows of all of them are resampled, so a path keeps the days
+          together. the dates stay the same, so the reset dates do not
+          change.
+      - lrf: log risk-free rate, pd.Series with the same index as logr,
+          resampled with the same rows. default 0.
+      - n_paths, block, method: see bootstrap_index.
+      - seed: the same seed gives the same paths.
+      - level: confidence level of the intervals.
+      - memory: bytes for the paths computed at once in each process.
+      - processes: number of worker processes, 0 to run in this process,
+          None for os.cpu_count().
+      - kw: other arguments of RRP, e.g. reset_months, target_risk.
+    return [intervals, metrics]: metrics is pd.DataFrame, one row for each
+    path, the columns of performance1 and 'out of money'. intervals is
+    pd.DataFrame, one row for each metric, columns 'mean', 'lower' and
+    'upper'.
+    the paths in memory are computed together: the ratio and leverage of
+    the reset dates of all paths in one stacked computation, then one
+    cumulative sum of (days, paths*assets). the metrics are computed
+    together by performance_table.
+    """
+    T, n = logr.shape
+    if lrf is None:
+        lrf = pd.Series(0.0, index=logr.index)
+    if isinstance(corr, pd.DataFrame):
+        corr = CorrCube.from_frame(corr)
+    # the portfolio of the sample checks the inputs, its reset dates and
+    # settings are shared by all paths
+    p = RRP(logr=logr, risk=risk, corr=corr, r_rolling=r_rolling,
+            rf_rolling=rf_rolling, **kw)
+    data = {'logr': logr.to_numpy(dtype=float),
+            'lrf': lrf.to_numpy(dtype=float).reshape(-1), 'corr': corr,
+            'reset_rows': p.reset_rows(),
+            'settings': {name: getattr(p, name) for name in settings},
+            'block': block, 'method': method, 'seed': seed}
+    if risk is not None:
+        data['risk'] = risk.to_numpy(dtype=float)
+    if p.usekelly or p.target_return:
+        data['r_rolling'] = r_rolling.loc[:, p.logr_names].to_numpy(
+            dtype=float)
+    if p.usekelly:
+        data['rf_rolling'] = rf_rolling.iloc[:, 0].to_numpy(dtype=float)
+    # rough bytes of one path: resampled inputs and intermediates
+    row = 8*(4*n + 16) + (8*corr.values[0].size if corr is not None else 0)
+    chunk = int(max(1, min(n_paths, memory // (3*row*T))))
+    chunks = [(a, min(a + chunk, n_paths)) for a in range(0, n_paths, chunk)]
+    if processes == 0:
+        _worker.update(data)
+        try:
+            parts = [_run_paths(a_chunk) for a_chunk in chunks]
+        finally:
+            _worker.clear()
+    else:
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(data,)) as pool:
+            parts = pool.map(_run_paths, chunks)
+    metrics = pd.concat(parts)
+    metrics.index.name = 'path'
+    values = metrics.drop(columns='out of money')
+    tail = (1 - level)/2
+    intervals = pd.DataFrame({'mean': values.mean(),
+                              'lower': values.quantile(tail),
+                              'upper': values.quantile(1 - tail)})
+    return [intervals, metrics]
+
+
+def _init_worker(data):
+    _worker.update(data)
+
+
+def _path_index(a, b):
+    """
+    rows of the paths a to b-1, from the seeds of their groups
+    """
+    T = len(_worker['logr'])
+    groups = range(a // paths_per_seed, (b - 1) // paths_per_seed + 1)
+    seeds = np.random.SeedSequence(_worker['seed']).spawn(groups[-1] + 1)
+    index = np.concatenate([
+        bootstrap_index(T, paths_per_seed, _worker['block'],
+                        _worker['method'], seeds[g])
+        for g in groups
+    ])
+    offset = groups[0]*paths_per_seed
+    return index[a - offset:b - offset]
+
+
+def _run_paths(a_chunk):
+    a, b = a_chunk
+    rows = _path_index(a, b)
+    reset_rows = _worker['reset_rows']
+    T, n = _worker['logr'].shape
+    # rows of the reset dates, (reset dates, paths)
+    reset_src = rows[:, reset_rows].T
+    ratio = _ratio_of(reset_src)
+    leverage = _leverage_of(reset_src, ratio)
+    # for each day, its reset period in reset_rows
+    period = np.searchsorted(reset_rows, np.arange(T), side='right') - 1
+    # actual cumulative assets return of all paths, (days, paths, assets)
+    r_actual_cum = segment_cumsum(
+        _worker['logr'][rows.T].reshape(T, -1), reset_rows
+    ).reshape(T, b - a, n)
+    np.expm1(r_actual_cum, out=r_actual_cum)
+    r_actual_cum *= ratio[period]
+    r_actual_cum *= leverage[period][:, :, None]
+    r_p_cum = np.nansum(r_actual_cum, axis=2)
+    logr_p = RRP.logr_p_of_cum(r_p_cum, reset_rows).astype(
+        _worker['settings']['dtype'])
+    metrics = performance_table(logr_p, _worker['lrf'][rows.T])
+    metrics.index = range(a, b)
+    metrics['out of money'] = (r_p_cum < -1).any(axis=0)
+    return metrics
+
+
+def _ratio_of(src):
+    """
+    ratio of the rows src (reset dates, paths), as RRP.ratio_at
+    """
+    s = _worker['settings']
+    n = _worker['logr'].shape[1]
+    if s['ratio_fixed']:
+        return np.broadcast_to(np.asarray(s['ratio_fixed'], dtype=float),
+                               src.shape + (n,))
+    vol = _worker['risk'][src]
+    if n == 2 and s['risk_budget'] is None:
+        return (1/vol) / np.nansum(1/vol, axis=2, keepdims=True)
+    array_cov = vol[..., :, None] * _corr_of(src) * vol[..., None, :]
+    ratio, info = risk_parity_ratio(array_cov.reshape(-1, n, n),
+                                    budget=s['risk_budget'])
+    if not info['converged'].all():
+        print('risk parity ratio not converged on some reset dates')
+    return ratio.reshape(src.shape + (n,))
+
+
+def _leverage_of(src, ratio):
+    """
+    leverage of the rows src (reset dates, paths), as RRP.leverage_at
+    """
+    s = _worker['settings']
+    if s['leverage_fixed']:
+        leverage = np.full(src.shape, float(s['leverage_fixed']))
+    elif s['usekelly']:
+        r_reset = np.nansum(_worker['r_rolling'][src] * ratio, axis=2)
+        leverage = ((r_reset - _worker['rf_rolling'][src]) /
+                    _portfolio_risk_of(src, ratio)**2)
+    elif s['target_risk']:
+        leverage = s['target_risk'] / _portfolio_risk_of(src, ratio)
+    elif s['target_return']:
+        leverage = np.exp(s['target_return'] - np.nansum(
+            _worker['r_rolling'][src] * ratio, axis=2
+        ))
+    else:
+        leverage = np.ones(src.shape)
+    if s['leverage_limit']:
+        leverage = np.where(leverage > s['leverage_limit'],
+                            s['leverage_limit'], leverage)
+    return leverage
+
+
+def _portfolio_risk_of(src, ratio):
+    n = ratio.shape[-1]
+    return portfolio_risk_batch(
+        array_corr=_corr_of(src).reshape(-1, n, n),
+        array_vol=_worker['risk'][src].reshape(-1, n),
+        array_ratio=ratio.reshape(-1, n)
+    ).reshape(src.shape)
+
+
+def _corr_of(src):
+    """
+    stacked correlation matrices of the rows src, (src..., assets, assets)
+    """
+    corr = _worker['corr']
+    n = len(corr.columns)
+    return corr.take(corr.index[src.reshape(-1)]).reshape(src.shape + (n, n))
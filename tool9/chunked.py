@@ -0,0 +1,119 @@
+__all__ = ['rrp_chunked']
+
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .class_corr import CorrCube
+from .class_result import RRPResult
+from .class_rrp import RRP
+from .loader import load_frame, _cached
+from .reset_calendar import month_interval, reset_calendar
+from .customized_exceptions import DataFrameError, DateValueError
+
+
+def rrp_chunked(out_dir, logr, reset_months, risk=None, corr=None,
+                r_rolling=None, rf_rolling=None, first_reset_date=None,
+                reset_shift_mode='after', dtype='float64', cache_dir=None,
+                **kw):
+    """
+    RRP one reset period at a time, for histories (e.g. minute bars) too
+    long to keep all the inputs and outputs in memory. the outputs of one
+    reset period only depend on the inputs of the period.
+      - out_dir: a new directory, the outputs are written to it as each
+          reset period is computed, in the layout of RRPResult.save.
+      - logr, risk, r_rolling, rf_rolling: pd.DataFrame, or the path of a
+          csv, loaded by load_frame (memory-mapped, in cache_dir).
+      - corr: CorrCube, or the path of a csv of corr layout, memory-mapped
+          as load_corr. a MultiIndex pd.DataFrame is converted in memory.
+      - first_reset_date, reset_months, reset_shift_mode: the reset
+          calendar of all days, see RRP.
+      - dtype: dtype of the outputs.
+      - kw: other arguments of RRP, e.g. ratio_fixed, target_risk,
+          leverage_limit, get_actual.
+    return RRPResult, the outputs are memory maps of the files in out_dir.
+    the dates (8 bytes a day) are read in memory for the reset calendar,
+    the other inputs and outputs in memory are of one reset period.
+    """
+    logr, risk, r_rolling, rf_rolling = [
+        load_frame(data, cache_dir=cache_dir)
+        if isinstance(data, (str, Path)) else data
+        for data in (logr, risk, r_rolling, rf_rolling)
+    ]
+    corr = _corr_arrays(corr, cache_dir)
+    index = logr.index
+    if corr is not None and not np.array_equal(corr[1], index.asi8):
+        raise DataFrameError('"logr" and "corr" have different index')
+    if first_reset_date is None:
+        first_reset_date = index[0]
+    first_reset_date = pd.Timestamp(first_reset_date)
+    if first_reset_date < index[0]:
+        raise DateValueError(
+            'the "first_reset_date" must be later than the first day'
+        )
+    if not isinstance(reset_months, int):
+        raise ValueError('"reset_months" should be int')
+    calendar = reset_calendar(index, first_reset_date, reset_months,
+                              reset_shift_mode)
+    position = calendar['reset_position']
+    reset_rows = np.unique(position[position < len(index)])
+    bounds = np.append(reset_rows, len(index))
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True)
+    np.save(out_dir / 'index.npy', index.asi8)
+    np.save(out_dir / 'reset_date.npy', calendar['reset_date'].asi8)
+    kw = dict({'memo': False}, **kw, compact=True, dtype=dtype)
+    out = {}
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        # the only reset of the period is its first day
+        months = (month_interval(index[a], index[b-1]) + 1 if b - a > 1
+                  else 1)
+        dates = slice(index[a], index[b-1])
+        p = RRP(logr=logr.iloc[a:b],
+                risk=None if risk is None else risk.iloc[a:b],
+                corr=None if corr is None else
+                CorrCube(corr[0][a:b], index[a:b], corr[2], triu=corr[3]),
+                r_rolling=None if r_rolling is None else r_rolling.loc[dates],
+                rf_rolling=None if rf_rolling is None else
+                rf_rolling.loc[dates],
+                first_reset_date=index[a], reset_months=months, **kw)
+        if not out:
+            out = _open_outputs(out_dir, p, len(index), dtype)
+        for name, array in out.items():
+            _, one_column = RRPResult.outputs[name]
+            data = getattr(p, name).to_numpy(dtype=dtype)
+            array[a:b] = data[:, 0] if one_column else data
+            array.flush()
+    RRPResult.write_meta(out_dir, logr.columns, list(out))
+    del out
+    return RRPResult.load(out_dir)
+
+
+def _corr_arrays(corr, cache_dir):
+    """
+    [values, dates as int64, columns, triu] of corr, or None
+    """
+    if corr is None:
+        return None
+    if isinstance(corr, (str, Path)):
+        values, dates, meta = _cached(corr, cache_dir, 'corr')
+        return [values, dates.view('int64'), meta['columns'], False]
+    if isinstance(corr, pd.DataFrame):
+        corr = CorrCube.from_frame(corr)
+    return [corr.values, corr.index.asi8, corr.columns, corr.triu]
+
+
+def _open_outputs(out_dir, p, T, dtype):
+    """
+    a .npy memory map of T rows for each output of the RRP p
+    """
+    out = {}
+    for name, (_, one_column) in RRPResult.outputs.items():
+        data = getattr(p, name)
+        if data is None:
+            continue
+        shape = (T,) if one_column else (T, data.shape[1])
+        out[name] = np.lib.format.open_memmap(
+            out_dir / (name + '.npy'), mode='w+', dtype=dtype, shape=shape
+        )
+    return out
@@ -0,0 +1,191 @@
+__all__ = ['RRPBatch']
+
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from .func import segment_cumsum
+from .class_corr import CorrCube
+from .class_rrp import RRP
+from .reset_calendar import reset_calendar
+from .customized_exceptions import DataFrameError, InputError
+
+
+class RRPBatch(object):
+    """
+    construct many fixed ratio portfolios ('FRP') of the same assets and
+    reset dates at once. the cumulative assets return of each reset period
+    is computed once for all portfolios, the portfolio returns are one
+    matrix product.
+
+    the same as RRP(ratio_fixed=..., ...) for each spec:
+      - specs: list of dict, one for each portfolio, with key ratio_fixed
+          and optional leverage_fixed, target_risk and leverage_limit.
+      - logr, risk, corr, first_reset_date, reset_months, reset_shift_mode
+          and get_actual: see RRP, shared by all portfolios. risk and corr
+          are needed for target_risk, risk_p and risk_p_actual.
+
+    Attributes:
+
+    [output]
+      - reset_date: pd.DatetimeIndex, the date of reset dates.
+      - ratio: np.ndarray (portfolios, assets).
+      - leverage: np.ndarray (portfolios, days).
+      - logr_p: portfolio log return, np.ndarray (portfolios, days).
+      - risk_p: portfolio risk, np.ndarray (portfolios, days), None if no
+          risk and corr.
+      - ratio_actual: np.ndarray (portfolios, days, assets), None if not
+          get_actual.
+      - risk_p_actual: np.ndarray (portfolios, days), None if not get_actual
+          or no risk and corr.
+    use frame(name) for the pd.DataFrame of an output, one column for each
+    portfolio.
+    """
+
+    spec_keys = ('ratio_fixed', 'leverage_fixed', 'target_risk',
+                 'leverage_limit')
+
+    def __init__(self, specs, logr, reset_months, risk=None, corr=None,
+                 first_reset_date=None, reset_shift_mode='after',
+                 get_actual=False):
+        if not specs:
+            raise InputError('"specs" is empty')
+        for spec in specs:
+            unknown = set(spec) - set(self.spec_keys)
+            if unknown:
+                raise InputError('unknown keys in "specs": {}'.
+                                 format(sorted(unknown)))
+            if not spec.get('ratio_fixed'):
+                raise InputError('each spec must have "ratio_fixed"')
+        if not is_datetime64_any_dtype(logr.index):
+            raise DataFrameError('the index of "logr" is not datetime')
+        self.specs = list(specs)
+        self.logr = logr
+        self.risk = risk
+        self.corr = corr
+        self.reset_months = reset_months
+        self.first_reset_date = pd.Timestamp(
+            logr.index[0] if first_reset_date is None else first_reset_date
+        )
+        self.reset_shift_mode = reset_shift_mode
+        self.get_actual = get_actual
+        self.index = logr.index
+        self.logr_names = list(logr.columns)
+        self.ratio = np.array([spec['ratio_fixed'] for spec in specs],
+                              dtype=float)
+        if self.ratio.shape[1] != len(self.logr_names):
+            raise DataFrameError('"ratio_fixed" and "logr" have different col')
+        if isinstance(corr, pd.DataFrame):
+            self.__corr_cube = CorrCube.from_frame(corr)
+        else:
+            self.__corr_cube = corr
+        self.construct()
+
+    def construct(self):
+        calendar = reset_calendar(self.index, self.first_reset_date,
+                                  self.reset_months, self.reset_shift_mode)
+        self.reset_date = calendar['reset_date']
+        position = calendar['reset_position']
+        reset_rows = np.unique(position[position < len(self.index)])
+        # for each day, its reset period in reset_rows
+        period = np.searchsorted(reset_rows, np.arange(len(self.index)),
+                                 side='right') - 1
+        has_risk = self.risk is not None and self.__corr_cube is not None
+        # portfolio risk of the reset dates (portfolios, reset periods)
+        self.risk_p = None
+        if has_risk:
+            reset_dates = self.index[reset_rows]
+            risk_reset = self.portfolio_risk_reset(reset_dates)
+            self.risk_p = risk_reset[:, period]
+        self.leverage = self.leverage_of(
+            len(reset_rows), risk_reset if has_risk else None
+        )[:, period]
+        # shared by all portfolios: expm1 of cumulative log return of
+        # assets in each reset period
+        asset_cum = segment_cumsum(self.logr.to_numpy(dtype=float),
+                                   reset_rows)
+        np.expm1(asset_cum, out=asset_cum)
+        missing = np.isnan(asset_cum)
+        # sum of ratio * return of assets for all portfolios at once,
+        # missing returns count as 0, as np.nansum in RRP
+        r_p_cum = (np.where(missing, 0, asset_cum) @ self.ratio.T).T
+        r_p_cum *= self.leverage
+        if (r_p_cum < -1).any():
+            print('one asset out of money in {} portfolios, please reduce '
+                  'leverage or set a limit'.
+                  format(int((r_p_cum < -1).any(axis=1).sum())))
+        logr_p_cum = np.log1p(r_p_cum)
+        logr_p = np.empty_like(logr_p_cum)
+        logr_p[:, 1:] = np.diff(logr_p_cum, axis=1)
+        logr_p[:, :1] = np.NaN
+        logr_p[:, reset_rows] = logr_p_cum[:, reset_rows]
+        self.logr_p = logr_p
+        self.ratio_actual = None
+        self.risk_p_actual = None
+        if not self.get_actual:
+            return
+        # (portfolios, days, assets)
+        r_actual_cum = (asset_cum[None] * self.ratio[:, None, :] *
+                        self.leverage[:, :, None])
+        self.ratio_actual = RRP.ratio_actual_of(r_actual_cum,
+                                                self.ratio[:, None, :])
+        if has_risk:
+            array_vol = self.risk.to_numpy(dtype=float)
+            w = self.ratio_actual * array_vol
+            self.risk_p_actual = np.sqrt(np.einsum(
+                'pti,tij,ptj->pt', w, self.__corr_cube.dense(), w,
+                optimize=True
+            ))
+
+    def portfolio_risk_reset(self, reset_dates):
+        """
+        portfolio risk of all portfolios on reset dates, as np.ndarray
+        (portfolios, reset dates)
+        """
+        array_vol = self.risk.loc[reset_dates].to_numpy(dtype=float)
+        array_cov = (array_vol[:, :, None] *
+                     self.__corr_cube.take(reset_dates) *
+                     array_vol[:, None, :])
+        return np.sqrt(np.einsum('pi,rij,pj->pr', self.ratio, array_cov,
+                                 self.ratio, optimize=True))
+
+    def leverage_of(self, n_reset, risk_reset=None):
+        """
+        leverage of all portfolios on n_reset reset dates, as np.ndarray
+        (portfolios, reset dates), the same rules as RRP.leverage_at
+        """
+        leverage = np.ones((len(self.specs), n_reset))
+        for i, spec in enumerate(self.specs):
+            if spec.get('leverage_fixed'):
+                leverage[i] = spec['leverage_fixed']
+            elif spec.get('target_risk'):
+                if risk_reset is None:
+                    raise InputError('"risk" and "corr" are needed for '
+                                     '"target_risk"')
+                leverage[i] = spec['target_risk'] / risk_reset[i]
+            if spec.get('leverage_limit'):
+                leverage[i, leverage[i] > spec['leverage_limit']] = \
+                    spec['leverage_limit']
+        return leverage
+
+    def frame(self, name):
+        """
+        output name (portfolios, days) as pd.DataFrame, index be datetime,
+        one column for each portfolio
+        """
+        data = getattr(self, name)
+        if data is None:
+            return None
+        if data.ndim != 2 or data.shape[1] != len(self.index):
+            raise InputError('"{}" is not (portfolios, days)'.format(name))
+        return pd.DataFrame(data.T, index=self.index)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __str__(self):
+        return ('RRPBatch: {} portfolios of {} assets {}, {} days'.
+                format(len(self.specs), len(self.logr_names),
+                       self.logr_names, len(self.index)))
+
+    __repr__ = __str__
@@ -0,0 +1,236 @@
+__all__ = ['CorrCube']
+
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from .customized_exceptions import DataFrameError
+
+
+class CorrCube(object):
+    """
+    correlation between assets for each observation, backed by one contiguous
+    np.ndarray instead of a long MultiIndex pd.DataFrame.
+
+      - cube[date] and cube.at(offset) return the correlation matrix of one
+          observation, a view of the storage (a new array if triu).
+          cube.offset(date) is O(1), from a dict of the dates built at the
+          first call.
+      - cube.take(dates) returns the stacked matrices of many dates.
+      - use CorrCube.from_frame / cube.to_frame to convert from / to the
+          MultiIndex layout used by RRP.
+      - cube.append adds new observations, amortized O(N^2) for each (the
+          dates are kept in a buffer too, index is a view of it).
+
+    Attributes:
+      - values: np.ndarray, shape (T, N, N), or (T, N*(N+1)/2) if triu.
+      - index: pd.DatetimeIndex, one date for each observation.
+      - columns: list, asset names.
+      - triu: bool, only store the upper triangle (with diagonal).
+    """
+
+    def __init__(self, values, index, columns, triu=False):
+        self.index = pd.DatetimeIndex(index)
+        self.columns = list(columns)
+        self.triu = triu
+        n = len(self.columns)
+        self.__iu = np.triu_indices(n)
+        values = np.ascontiguousarray(values, dtype=float)
+        if values.ndim == 3:
+            if values.shape[1:] != (n, n):
+                raise DataFrameError('"values" and "columns" do not match')
+            if triu:
+                values = np.ascontiguousarray(
+                    values[:, self.__iu[0], self.__iu[1]]
+                )
+        elif values.ndim == 2 and triu:
+            if values.shape[1] != len(self.__iu[0]):
+                raise DataFrameError('"values" and "columns" do not match')
+        else:
+            raise DataFrameError('"values" should have shape (T, N, N)')
+        if len(values) != len(self.index):
+            raise DataFrameError('"values" and "index" have different length')
+        if not self.index.is_unique:
+            raise DataFrameError('the index of "corr" has duplicate dates')
+        self.values = values
+        # values is the head of buffer, buffer grows when append, and the
+        # dates (int64 nanoseconds) of index are the head of date_buffer
+        self.__buffer = values
+        self.__date_buffer = None
+        self.__own = False
+        # index is sorted, checked when dates are searched first
+        self.__sorted = None
+        # date (int64 nanoseconds): offset, built when a single date is
+        # looked up first, so a cube only used by take (e.g. one slice of
+        # rrp_chunked) skips it
+        self.__offset = None
+
+    @classmethod
+    def from_frame(cls, data, triu=False):
+        """
+        convert a MultiIndex pd.DataFrame (outer index be datetime, inner
+        index be asset name) to CorrCube
+        """
+        n = data.shape[1]
+        if len(data) % n:
+            raise DataFrameError('"corr" is not a stack of square matrices')
+        dates = data.index.get_level_values(0)
+        if not is_datetime64_any_dtype(dates):
+            raise DataFrameError('the outer index of "corr" is not datetime')
+        return cls(values=data.to_numpy(dtype=float).reshape(-1, n, n),
+                   index=dates[::n], columns=data.columns, triu=triu)
+
+    def to_frame(self):
+        """
+        convert to the MultiIndex pd.DataFrame layout
+        """
+        n = len(self.columns)
+        index = pd.MultiIndex.from_product([self.index, self.columns])
+        return pd.DataFrame(self.dense().reshape(-1, n), index=index,
+                            columns=self.columns)
+
+    def append(self, values, index):
+        """
+        append new observations after the last one, in place
+          - values: correlation matrices, shape (k, N, N) or (N, N)
+          - index: dates of the new observations
+        the storage grows by doubling, the arrays given to __init__ are
+        never written.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 2:
+            values = values[None]
+        index = pd.DatetimeIndex(index)
+        n = len(self.columns)
+        if values.shape != (len(index), n, n):
+            raise DataFrameError('"values" and "index" do not match')
+        if len(self.index) and (index <= self.index[-1]).any():
+            raise DataFrameError('new dates must be after the last date')
+        if self.triu:
+            values = values[:, self.__iu[0], self.__iu[1]]
+        t = len(self.values)
+        k = len(values)
+        # move to a new buffer if full or if it is the array of __init__
+        if not self.__own or t + k > len(self.__buffer):
+            buffer = np.empty((max(2*t, t+k),) + self.values.shape[1:])
+            buffer[:t] = self.values
+            self.__buffer = buffer
+            self.__date_buffer = np.empty(len(buffer), dtype=np.int64)
+            self.__date_buffer[:t] = self.index.asi8
+            self.__own = True
+        self.__buffer[t:t+k] = values
+        self.values = self.__buffer[:t+k]
+        if self.__offset is not None:
+            self.__offset.update(zip(index.asi8.tolist(), range(t, t+k)))
+        if self.__sorted:
+            self.__sorted = index.is_monotonic_increasing
+        self.__date_buffer[t:t+k] = index.asi8
+        self.index = _dates_of(self.__date_buffer[:t+k], self.index)
+
+    def offset(self, date):
+        """
+        position of one date in the storage
+        """
+        if self.__offset is None:
+            self.__offset = dict(zip(self.index.asi8.tolist(),
+                                     range(len(self.index))))
+        date = pd.Timestamp(date)
+        try:
+            return self.__offset[date.value]
+        except KeyError:
+            raise KeyError(date)
+
+    def offsets(self, dates):
+        """
+        positions of many dates in the storage, as np.ndarray
+        """
+        if self.__offset is not None and len(dates) < 64:
+            # a few dates, the dict is faster than searching index
+            position = np.array([self.__offset.get(pd.Timestamp(date).value,
+                                                   -1)
+                                 for date in dates], dtype=int)
+        elif self.is_sorted():
+            dates = pd.DatetimeIndex(dates)
+            # binary search in the sorted dates, no hash table of index
+            position = self.index.searchsorted(dates)
+            found = position < len(self.index)
+            found[found] = self.index[position[found]] == dates[found]
+            position[~found] = -1
+        else:
+            position = self.index.get_indexer(dates)
+        if (position < 0).any():
+            raise KeyError('some dates are not found in "corr"')
+        return position
+
+    def is_sorted(self):
+        """
+        True if index is increasing, checked once and kept by append
+        """
+        if self.__sorted is None:
+            self.__sorted = self.index.is_monotonic_increasing
+        return self.__sorted
+
+    def at(self, i):
+        """
+        correlation matrix of the i-th observation
+        """
+        if not self.triu:
+            return self.values[i]
+        return self.__unpack(self.values[i:i+1])[0]
+
+    def take(self, dates):
+        """
+        stacked correlation matrices of dates, shape (dates, N, N)
+        """
+        position = self.offsets(dates)
+        if not self.triu:
+            return self.values[position]
+        return self.__unpack(self.values[position])
+
+    def dense(self):
+        """
+        all correlation matrices, shape (T, N, N)
+        """
+        if not self.triu:
+            return self.values
+        return self.__unpack(self.values)
+
+    def __unpack(self, packed):
+        n = len(self.columns)
+        full = np.empty((len(packed), n, n))
+        full[:, self.__iu[0], self.__iu[1]] = packed
+        full[:, self.__iu[1], self.__iu[0]] = packed
+        return full
+
+    def __getitem__(self, date):
+        return self.at(self.offset(date))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.dense()
+        return self.dense().astype(dtype)
+
+    @property
+    def shape(self):
+        return (len(self.index), len(self.columns), len(self.columns))
+
+    def __str__(self):
+        return ('CorrCube: {} observations of {} assets {}'.
+                format(len(self.index), len(self.columns), self.columns) +
+                (', upper triangle only' if self.triu else ''))
+
+    __repr__ = __str__
+
+
+def _dates_of(values, like):
+    """
+    pd.DatetimeIndex of the int64 nanoseconds values, a view of them, with
+    the dtype (time zone) and name of the index like
+    """
+    return pd.DatetimeIndex(
+        pd.arrays.DatetimeArray(values.view('M8[ns]'), dtype=like.dtype),
+        name=like.name, copy=False
+    )
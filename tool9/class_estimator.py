@@ -0,0 +1,135 @@
+__all__ = ['CovEstimator']
+
+
+import numpy as np
+from .customized_exceptions import InputError
+
+
+class CovEstimator(object):
+    """
+    covariance of assets, updated one day at a time in O(N^2).
+
+      - rolling window: covariance of the last window days.
+      - EWMA: if halflife is provided, exponentially weighted covariance,
+          same as pd.DataFrame.ewm(halflife=halflife, adjust=False)
+          .cov(bias=True).
+      - days with any missing value are skipped.
+      - est.update(x) adds one day, est.cov() / est.corr() return the
+          estimate after the days added.
+
+    Attributes:
+      - n: number of assets.
+      - window: int, number of days in the rolling window.
+      - halflife: number, halflife of EWMA in days, None for rolling window.
+      - min_periods: minimum number of days to give an estimate, default
+          window for rolling window, 2 for EWMA.
+      - count: number of days in the estimate.
+    """
+
+    def __init__(self, n, window=250, halflife=None, min_periods=None):
+        if halflife is None and window < 2:
+            raise InputError('"window" should be at least 2')
+        self.n = n
+        self.window = window
+        self.halflife = halflife
+        if min_periods is None:
+            min_periods = window if halflife is None else 2
+        self.min_periods = min_periods
+        self.count = 0
+        self.__mean = np.zeros(n)
+        self.__cov = np.zeros((n, n))
+        if halflife is None:
+            # sums of the days in window, and the days in a ring buffer
+            self.__buffer = np.empty((window, n))
+            self.__sum = np.zeros(n)
+            self.__sum2 = np.zeros((n, n))
+            self.__added = 0
+        else:
+            self.__alpha = 1 - np.exp(np.log(0.5)/halflife)
+
+    def update(self, x):
+        """
+        add the returns x (N,) of one day
+        """
+        x = np.asarray(x, dtype=float)
+        if np.isnan(x).any():
+            return
+        if self.halflife is not None:
+            self.__update_ewma(x)
+        else:
+            self.__update_rolling(x)
+
+    def __update_ewma(self, x):
+        if not self.count:
+            self.__mean = x.copy()
+        else:
+            a = self.__alpha
+            d = x - self.__mean
+            self.__mean += a*d
+            self.__cov += a*np.outer(d, d)
+            self.__cov *= 1 - a
+        self.count += 1
+
+    def __update_rolling(self, x):
+        slot = self.__added % self.window
+        if self.count == self.window:
+            old = self.__buffer[slot]
+            self.__sum -= old
+            self.__sum2 -= np.outer(old, old)
+        else:
+            self.count += 1
+        self.__buffer[slot] = x
+        self.__sum += x
+        self.__sum2 += np.outer(x, x)
+        self.__added += 1
+        # sum again once each window days, errors of adding and removing
+        # do not grow
+        if not self.__added % self.window:
+            days = self.__buffer[:self.count]
+            self.__sum = days.sum(axis=0)
+            self.__sum2 = days.T @ days
+
+    def mean(self):
+        """
+        mean daily return, np.ndarray (N,)
+        """
+        if self.count < self.min_periods:
+            return np.full(self.n, np.nan)
+        if self.halflife is not None:
+            return self.__mean.copy()
+        return self.__sum/self.count
+
+    def cov(self):
+        """
+        covariance of daily returns, np.ndarray (N, N), NaN if not enough
+        days
+        """
+        if self.count < self.min_periods:
+            return np.full((self.n, self.n), np.nan)
+        if self.halflife is not None:
+            return self.__cov.copy()
+        return ((self.__sum2 - np.outer(self.__sum, self.__sum)/self.count) /
+                (self.count-1))
+
+    def corr(self):
+        """
+        return [correlation (N, N), daily volatility (N,)]
+        """
+        cov = self.cov()
+        vol = np.sqrt(np.maximum(np.diagonal(cov), 0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(vol, vol)
+        np.clip(corr, -1, 1, out=corr)
+        if self.count >= self.min_periods:
+            np.fill_diagonal(corr, 1)
+        return [corr, vol]
+
+    def __str__(self):
+        if self.halflife is None:
+            kind = 'rolling window of {} days'.format(self.window)
+        else:
+            kind = 'EWMA with halflife {} days'.format(self.halflife)
+        return 'CovEstimator: {} assets, {}, {} days added'.format(
+            self.n, kind, self.count)
+
+    __repr__ = __str__
@@ -0,0 +1,210 @@
+__all__ = ['RiskMemo', 'risk_memo']
+
+
+from collections import OrderedDict
+import hashlib
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from .func import portfolio_risk_batch
+
+
+class RiskMemo(object):
+    """
+    least recently used memo of covariance matrices (by date) and portfolio
+    risk (by date and ratio) computed from the same risk and corr, shared by
+    the RRP instances of a process. RRP uses risk_memo of this module by
+    default (memo=True).
+
+      - memo.cov(risk, corr, corr_cube, dates): (dates, assets, assets)
+      - memo.portfolio_risk(risk, corr, corr_cube, dates, array_ratio):
+          (dates,), the same as portfolio_risk_batch
+      - memo.invalidate(data) forgets what was computed from data (a risk
+          or corr changed in place), memo.clear() forgets all.
+      - memo.stats() returns the hits, misses, entries and bytes.
+
+    risk and corr are the inputs given by the user, corr_cube is the
+    CorrCube of corr. they are known by identity and a hash of their
+    values (memo.source), so a risk or corr changed in place is not mixed
+    up with the old one. the entries of them are removed when they are
+    freed. pass the source to cov and portfolio_risk to hash only once.
+      - max_cov_bytes: bytes of the covariance matrices kept.
+      - max_risk: number of portfolio risk values kept.
+    """
+
+    def __init__(self, max_cov_bytes=2**27, max_risk=2**17):
+        self.max_cov_bytes = max_cov_bytes
+        self.max_risk = max_risk
+        self.__cov = OrderedDict()
+        self.__cov_bytes = 0
+        self.__risk = OrderedDict()
+        # id of risk or corr: [sources of it, weakref.finalize]
+        self.__watched = {}
+        self.__lock = threading.RLock()
+        self.hits = {'cov': 0, 'risk': 0}
+        self.misses = {'cov': 0, 'risk': 0}
+
+    def source(self, risk, corr, corr_cube=None):
+        """
+        the key of the entries computed from risk and corr: their identity
+        and the blake2b hash of the values of risk and corr_cube (or corr)
+        """
+        h = hashlib.blake2b(digest_size=16)
+        arrays = [risk.index.asi8, risk.to_numpy(dtype=float)]
+        if corr_cube is not None:
+            arrays += [corr_cube.index.asi8, corr_cube.values]
+        else:
+            arrays += [np.asarray(corr, dtype=float)]
+        for values in arrays:
+            values = np.ascontiguousarray(values)
+            h.update(str(values.shape).encode())
+            h.update(memoryview(values).cast('B'))
+        key = (id(risk), id(corr), h.hexdigest())
+        with self.__lock:
+            # the same objects with other values were changed in place
+            old = {other for other in self.__watched.get(id(risk), [()])[0]
+                   if other[:2] == key[:2] and other != key}
+            for data in (risk, corr):
+                if id(data) not in self.__watched:
+                    self.__watched[id(data)] = [
+                        set(), weakref.finalize(data, self.forget, id(data))
+                    ]
+                self.__watched[id(data)][0].add(key)
+                self.__watched[id(data)][0].difference_update(old)
+        if old:
+            self.forget_sources(old)
+        return key
+
+    def cov(self, risk, corr, corr_cube, dates, source=None):
+        """
+        covariance matrices of dates, as np.ndarray (dates, assets, assets)
+        source: memo.source(risk, corr, corr_cube), computed if None
+        """
+        if source is None:
+            source = self.source(risk, corr, corr_cube)
+        keys = [(source, date) for date in dates.asi8]
+        found = self.__get(self.__cov, keys, 'cov')
+        missing = [i for i, value in enumerate(found) if value is None]
+        if missing:
+            miss_dates = dates[missing]
+            array_vol = risk.loc[miss_dates].to_numpy(dtype=float)
+            array_cov = (array_vol[:, :, None] * corr_cube.take(miss_dates) *
+                         array_vol[:, None, :])
+            with self.__lock:
+                for i, cov in zip(missing, array_cov):
+                    found[i] = cov
+                    self.__cov[keys[i]] = cov = cov.copy()
+                    self.__cov_bytes += cov.nbytes
+                while self.__cov_bytes > self.max_cov_bytes and self.__cov:
+                    self.__cov_bytes -= self.__cov.popitem(last=False)[1].\
+                        nbytes
+        n = len(corr_cube.columns)
+        return np.stack(found) if found else np.empty((0, n, n))
+
+    def portfolio_risk(self, risk, corr, corr_cube, dates, array_ratio,
+                       source=None):
+        """
+        portfolio risk of dates with the ratio (dates, assets) of the dates,
+        as np.ndarray (dates,)
+        source: memo.source(risk, corr, corr_cube), computed if None
+        """
+        if source is None:
+            source = self.source(risk, corr, corr_cube)
+        array_ratio = np.ascontiguousarray(array_ratio, dtype=float)
+        keys = [(source, date, ratio.tobytes())
+                for date, ratio in zip(dates.asi8, array_ratio)]
+        found = self.__get(self.__risk, keys, 'risk')
+        missing = [i for i, value in enumerate(found) if value is None]
+        if missing:
+            miss_dates = dates[missing]
+            values = portfolio_risk_batch(
+                array_corr=corr_cube.take(miss_dates),
+                array_vol=risk.loc[miss_dates].to_numpy(),
+                array_ratio=array_ratio[missing]
+            )
+            with self.__lock:
+                for i, value in zip(missing, values):
+                    found[i] = value
+                    self.__risk[keys[i]] = value
+                while len(self.__risk) > self.max_risk:
+                    self.__risk.popitem(last=False)
+        return np.array(found, dtype=float)
+
+    def __get(self, entries, keys, kind):
+        found = []
+        with self.__lock:
+            for key in keys:
+                value = entries.get(key)
+                if value is not None:
+                    entries.move_to_end(key)
+                found.append(value)
+            hits = sum(value is not None for value in found)
+            self.hits[kind] += hits
+            self.misses[kind] += len(keys) - hits
+        return found
+
+    def invalidate(self, data):
+        """
+        forget the entries computed from data (risk or corr), call it after
+        changing data in place
+        """
+        with self.__lock:
+            watched = self.__watched.pop(id(data), None)
+            if watched is None:
+                return
+            watched[1].detach()
+        self.forget_sources(watched[0])
+
+    def forget(self, data_id):
+        """
+        forget the entries computed from the risk or corr of id data_id
+        """
+        with self.__lock:
+            watched = self.__watched.pop(data_id, None)
+        if watched is not None:
+            self.forget_sources(watched[0])
+
+    def forget_sources(self, sources):
+        with self.__lock:
+            for key in [key for key in self.__cov if key[0] in sources]:
+                self.__cov_bytes -= self.__cov.pop(key).nbytes
+            for key in [key for key in self.__risk if key[0] in sources]:
+                del self.__risk[key]
+
+    def clear(self):
+        """
+        forget all entries and reset the counts
+        """
+        with self.__lock:
+            for watched in self.__watched.values():
+                watched[1].detach()
+            self.__watched.clear()
+            self.__cov.clear()
+            self.__cov_bytes = 0
+            self.__risk.clear()
+            self.hits = {'cov': 0, 'risk': 0}
+            self.misses = {'cov': 0, 'risk': 0}
+
+    def stats(self):
+        """
+        hits, misses, entries and bytes of the covariance matrices ('cov')
+        and portfolio risk ('risk'), as pd.DataFrame
+        """
+        with self.__lock:
+            return pd.DataFrame({
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': {'cov': len(self.__cov), 'risk': len(self.__risk)},
+                'bytes': {'cov': self.__cov_bytes,
+                          'risk': 8*len(self.__risk)}
+            })
+
+    def __str__(self):
+        return 'RiskMemo:\n{}'.format(self.stats())
+
+    __repr__ = __str__
+
+
+# shared by all RRP instances of this process
+risk_memo = RiskMemo()
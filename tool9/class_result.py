@@ -0,0 +1,133 @@
+__all__ = ['RRPResult']
+
+
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+class RRPResult(object):
+    """
+    the outputs of a RRP, without its inputs and intermediates, kept in
+    np.ndarray with fixed slots. for keeping many portfolios in memory.
+
+      - result = p.result(dtype='float32')
+      - result.frame('ratio') returns the pd.DataFrame of RRP.ratio
+      - result.memory_usage() returns the bytes used
+      - result.save(directory) and RRPResult.load(directory) keep it on
+          disk, one .npy file for each output, loaded as memory maps
+
+    Attributes:
+      - index: pd.DatetimeIndex, shared with the RRP, not copied.
+      - logr_names: list, asset names.
+      - reset_date: pd.DatetimeIndex, the date of reset dates.
+      - logr_p, leverage, risk_p, risk_p_actual: np.ndarray (days,)
+      - ratio, ratio_actual: np.ndarray (days, assets)
+      - risk_p, risk_p_actual and ratio_actual are None if not get_actual.
+    """
+
+    __slots__ = ('index', 'logr_names', 'reset_date', 'logr_p', 'ratio',
+                 'leverage', 'ratio_actual', 'risk_p', 'risk_p_actual')
+
+    # output name: (column name of the pd.DataFrame, one column)
+    outputs = {'logr_p': ('portfolio', True),
+               'ratio': (None, False),
+               'leverage': ('leverage', True),
+               'ratio_actual': (None, False),
+               'risk_p': ('portfolio', True),
+               'risk_p_actual': ('portfolio', True)}
+
+    # change it when the layout of saved files changes
+    file_version = 1
+
+    def __init__(self, rrp, dtype='float64'):
+        self.index = rrp.index
+        self.logr_names = list(rrp.logr_names)
+        self.reset_date = rrp.reset_date
+        for name, (_, one_column) in self.outputs.items():
+            data = getattr(rrp, name)
+            if data is not None:
+                data = data.to_numpy(dtype=dtype)
+                if one_column:
+                    data = data[:, 0]
+            setattr(self, name, data)
+
+    def frame(self, name):
+        """
+        the output name as pd.DataFrame, same as the attribute of RRP
+        """
+        column, one_column = self.outputs[name]
+        data = getattr(self, name)
+        if data is None:
+            return None
+        if one_column:
+            return pd.DataFrame({column: data}, index=self.index)
+        return pd.DataFrame(data, index=self.index, columns=self.logr_names)
+
+    def save(self, directory):
+        """
+        write the outputs to a new directory, one .npy file for each
+        """
+        directory = Path(directory)
+        directory.mkdir()
+        np.save(directory / 'index.npy', self.index.asi8)
+        np.save(directory / 'reset_date.npy', self.reset_date.asi8)
+        outputs = []
+        for name in self.outputs:
+            data = getattr(self, name)
+            if data is not None:
+                np.save(directory / (name + '.npy'), data)
+                outputs.append(name)
+        self.write_meta(directory, self.logr_names, outputs)
+
+    @classmethod
+    def write_meta(cls, directory, logr_names, outputs):
+        """
+        meta of a saved result, written last, a directory without meta is
+        not a result
+        """
+        meta = {'version': cls.file_version, 'logr_names': list(logr_names),
+                'outputs': list(outputs)}
+        with open(Path(directory) / 'meta.json', 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        the result saved in directory, the outputs are memory maps (read
+        only) if mmap
+        """
+        directory = Path(directory)
+        with open(directory / 'meta.json') as f:
+            meta = json.load(f)
+        if meta['version'] != cls.file_version:
+            raise ValueError('"{}" is saved by another version'.
+                             format(directory))
+        mode = 'r' if mmap else None
+        result = cls.__new__(cls)
+        result.index = pd.DatetimeIndex(np.load(directory / 'index.npy'))
+        result.reset_date = pd.DatetimeIndex(
+            np.load(directory / 'reset_date.npy')
+        )
+        result.logr_names = meta['logr_names']
+        for name in cls.outputs:
+            setattr(result, name,
+                    np.load(directory / (name + '.npy'), mmap_mode=mode)
+                    if name in meta['outputs'] else None)
+        return result
+
+    def memory_usage(self):
+        """
+        bytes used by each output, as pd.Series, index is not counted
+        """
+        return pd.Series({name: 0 if getattr(self, name) is None
+                          else getattr(self, name).nbytes
+                          for name in self.outputs})
+
+    def __str__(self):
+        return ('RRPResult: {} days of {} assets {}, {} bytes'.
+                format(len(self.index), len(self.logr_names), self.logr_names,
+                       self.memory_usage().sum()))
+
+    __repr__ = __str__
@@ -1,13 +1,18 @@
 __all__ = ['RRP']
 
 
-from datetime import timedelta
+from time import perf_counter
+import tracemalloc
 import pandas as pd
 from pandas.api.types import is_datetime64_any_dtype
 import numpy as np
-from .func import portfolio_risk, period, es
-from .customized_exceptions import (DataFrameError, InputError, DateValueError,
-                                    UnfinishedFeature)
+from .func import (portfolio_risk_batch, risk_parity_ratio, segment_cumsum,
+                   period, es)
+from .class_corr import CorrCube, _dates_of
+from .class_result import RRPResult
+from .class_memo import RiskMemo, risk_memo
+from .reset_calendar import month_interval, reset_points, reset_calendar
+from .customized_exceptions import DataFrameError, InputError, DateValueError
 
 
 class RRP(object):
@@ -19,7 +24,8 @@ class RRP(object):
       - must input logr, reset_months.
       - if use FRP, input ratio_fixed.
         - but if get_actual == True, risk is also needed
-      - if use RRP, input risk, corr(more than 2 assets, UnfinishedFeature).
+      - if use RRP, input risk, corr.
+        - risk_budget is optional, default equal risk contribution.
       - if use fixed leverate, input leverage_fixed.
       - if use kelly formula to get leverage, let usekelly = True.
         - then rf_rolling and r_rolling must provided
@@ -27,18 +33,26 @@ class RRP(object):
       - if use target return, input target_return and rolling_return
       - first_reset_date and leverage_limit is optional.
       - use new_[input] to renew input and construct new portfolio.
+        - only the stages depending on the input are computed again.
+      - use append to add new days after the last day.
+      - use leverage_grid(leverage_fixed=[...] or target_risk=[...],
+          leverage_limit=...) for logr_p of many leverage settings at once.
+      - to keep many portfolios in memory, use compact=True, dtype='float32'
+          or p.result(), see memory_usage.
+      - to find the slow stage, use profile=True, see stage_stats.
 
     Attributes:
 
     [input]
       - ratio_fixed: list, a fixed ratio of assets, construct FRP if provided.
+      - risk_budget: list, risk budget of assets for RRP, default equal.
       - logr: log return of assets, pd.DataFrame with column be asset name,
           index be datetime.
       - risk: risk of assets, pd.DataFrame with column name be risk name,
           index be datetime.
       - corr: correlation between assets for each observation, pd.DataFrame
           with column name be asset name, outer index be datetime, inner
-          index be asset name.
+          index be asset name. or a CorrCube.
       - first_reset_date: string or datetime, reset at the begining of day.
       - reset_months: int, number of months between two reset date.
       - reset_shift_mode: determine whether take the first trading day after or
@@ -59,6 +73,23 @@ class RRP(object):
       - leverage_limit: number, if provided, leverage won't be higher than it.
       - get_actual: default False, get actual ratio, portfolio risk and actual
           portfolio risk.
+      - compact: default False, drop the intermediates after construct, they
+          are computed again if needed (by new_[input] or append).
+      - dtype: dtype of the outputs, default 'float64', 'float32' halves
+          their memory. computed in float64 anyway.
+      - profile: default False, record wall time, calls and peak allocation
+          (by tracemalloc) of each stage in stage_stats. 'time' to skip
+          the allocation, which slows the stages down.
+      - profile_callback: function called after each stage if profile, as
+          profile_callback(stage, record), record is a dict with 'seconds'
+          and 'peak_bytes' (None if profile == 'time').
+      - memo: default True, keep the covariance matrices and portfolio risk
+          of reset dates in the RiskMemo shared by RRP instances, so the
+          instances with the same risk and corr do not compute them again.
+          risk and corr are hashed once (construct, new_risk, new_corr),
+          a risk or corr changed in place needs new_risk / new_corr. after
+          append, risk and corr belong to this portfolio and the memo is not
+          used. False to not keep them, or a RiskMemo of your own.
 
     [output]
       - sample_month_interval: total months in sample period.
@@ -77,13 +108,46 @@ class RRP(object):
           use rolling corr, vol and real ratio)
       - leverage: leverage of portfolio, pd.DataFrame with column name be
           'leverage', index be datetime.
+      - out_of_money: True if the portfolio lost all its money (cumulative
+          return below -100%) in a reset period.
+      - stage_stats: dict, for each stage run since construct (and 'append'),
+          a dict of 'calls', 'seconds' (total) and 'peak_bytes' (max).
+          empty if not profile.
+      - ratio_solve_info: convergence of the risk parity solver, pd.DataFrame
+          with column 'iterations', 'converged', 'error' and 'solve_time',
+          index be reset date. None if the solver is not used.
     """
 
+    # stages of construct: (inputs and stages it depends on, methods to run)
+    stages = {
+        'reset': (('logr', 'first_reset_date', 'reset_months',
+                   'reset_shift_mode'),
+                  ('get_reset_calendar',)),
+        'ratio': (('reset', 'logr', 'ratio_fixed', 'risk_budget', 'risk',
+                   'corr'),
+                  ('get_ratio',)),
+        'leverage': (('reset', 'ratio', 'risk', 'corr', 'leverage_fixed',
+                      'usekelly', 'rf_rolling', 'r_rolling', 'target_risk',
+                      'target_return', 'leverage_limit'),
+                     ('get_leverage',)),
+        'logr_p': (('reset', 'logr', 'ratio', 'leverage'),
+                   ('get_logr_p',)),
+        'ratio_actual': (('logr_p', 'ratio', 'get_actual'),
+                         ('get_ratio_actual',)),
+        'risk_p': (('reset', 'ratio', 'risk', 'corr', 'get_actual'),
+                   ('get_risk_p',)),
+        'risk_p_actual': (('ratio_actual', 'risk', 'corr', 'get_actual'),
+                          ('get_risk_p_actual',)),
+    }
+    # stages only computed if get_actual, named as their output
+    actual_stages = ('ratio_actual', 'risk_p', 'risk_p_actual')
+
     def __init__(self, **kw):
         if not kw:
             raise InputError('please provide arguments, please')
         # inputs
         self.ratio_fixed = None
+        self.risk_budget = None
         self.logr = None
         self.risk = None
         self.corr = None
@@ -98,6 +162,11 @@ class RRP(object):
         self.r_rolling = None
         self.leverage_limit = None
         self.get_actual = False
+        self.compact = False
+        self.dtype = 'float64'
+        self.profile = False
+        self.profile_callback = None
+        self.memo = True
         # generated useful values
         self.index = None
         self.first_day = None
@@ -109,11 +178,19 @@ class RRP(object):
         self.reset_times = None
         self.reset_date = None
         self.logr_p = None
+        self.out_of_money = None
         self.ratio = None
+        self.ratio_solve_info = None
         self.ratio_actual = None
         self.risk_p = None
         self.risk_p_actual = None
         self.leverage = None
+        self.stage_stats = {}
+        self.__memo_source = None
+        # risk and corr are grown by append, see used_memo
+        self.__appended = False
+        # the CorrCube grown by append
+        self.__corr_own = None
         # do it
         self.input(kw)
         self.check_inputs()
@@ -123,6 +200,8 @@ class RRP(object):
     def input(self, kw):
         if 'ratio_fixed' in kw:
             self.ratio_fixed = kw['ratio_fixed']
+        if 'risk_budget' in kw:
+            self.risk_budget = kw['risk_budget']
         if 'logr' in kw:
             self.logr = kw['logr']
         else:
@@ -159,6 +238,16 @@ class RRP(object):
             self.r_rolling = kw['r_rolling']
         if 'get_actual' in kw:
             self.get_actual = kw['get_actual']
+        if 'compact' in kw:
+            self.compact = kw['compact']
+        if 'dtype' in kw:
+            self.dtype = kw['dtype']
+        if 'profile' in kw:
+            self.profile = kw['profile']
+        if 'profile_callback' in kw:
+            self.profile_callback = kw['profile_callback']
+        if 'memo' in kw:
+            self.memo = kw['memo']
 
     def check_inputs(self):
         if self.risk is not None:
@@ -176,7 +265,11 @@ class RRP(object):
             raise DataFrameError('"logr" must have more than 2 columns')
         if not is_datetime64_any_dtype(self.logr.index):
             raise DataFrameError('the index of "logr" is not datetime')
-        if len(self.logr) != int(self.corr.shape[0]/self.corr.shape[1]):
+        if isinstance(self.corr, CorrCube):
+            corr_length = len(self.corr)
+        else:
+            corr_length = int(self.corr.shape[0]/self.corr.shape[1])
+        if len(self.logr) != corr_length:
             raise DataFrameError('"logr" and "corr" have different length')
         if isinstance(self.first_reset_date, str):
             self.first_reset_date = pd.to_datetime(self.first_reset_date)
@@ -192,6 +285,8 @@ class RRP(object):
             raise ValueError('"reset_months" should be int')
         if not isinstance(self.usekelly, bool):
             raise ValueError('"usekelly" should be bool')
+        if np.dtype(self.dtype) not in (np.float64, np.float32):
+            raise ValueError('"dtype" should be "float64" or "float32"')
         if self.usekelly:
             if (self.rf_rolling is None) | (self.r_rolling is None):
                 e = '"rf_rolling" or "r_rolling" must provided if usekelly'
@@ -203,285 +298,474 @@ class RRP(object):
         self.last_day = self.index[-1]
         self.N = len(self.index)
         self.logr_names = list(self.logr.columns)
+        # only convert corr again if it is given again (new_corr)
+        if getattr(self, '_RRP__corr_source', None) is not self.corr:
+            if isinstance(self.corr, CorrCube):
+                self.__corr_cube = self.corr
+            else:
+                self.__corr_cube = CorrCube.from_frame(self.corr)
+            self.__corr_source = self.corr
 
     def construct(self):
-        self.get_sample_month_interval()
-        self.get_reset_points()
-        self.get_reset_date()
-        self.get_last_reset_date()
-        self.get_ratio()
-        self.get_leverage()
-        self.get_logr_p()
-        if self.get_actual:
-            self.get_ratio_actual()
-            self.get_risk_p()
-            self.get_risk_p_actual()
-        else:
-            self.ratio_actual = None
-            self.risk_p = None
-            self.risk_p_actual = None
+        """
+        compute all the stages
+        """
+        self.__done = set()
+        self.__r_actual_cum = None
+        # name: [buffer, rows used], see grow
+        self.__buffers = {}
+        self.stage_stats = {}
+        self.update()
 
-    def new_ratio_fixed(self, change):
-        self.ratio_fixed = change
+    def update(self, changed=()):
+        """
+        compute the stages depending on the changed inputs (directly or
+        through other stages), and the stages not computed yet
+        """
+        changed = set(changed)
+        for stage, (depends, methods) in self.stages.items():
+            if stage in self.__done and changed.isdisjoint(depends):
+                continue
+            if stage in self.actual_stages and not self.get_actual:
+                setattr(self, stage, None)
+            elif self.profile:
+                self.run_profiled(stage, methods)
+            else:
+                for method in methods:
+                    getattr(self, method)()
+            self.__done.add(stage)
+            changed.add(stage)
+        self.finish()
+
+    def run_profiled(self, stage, methods, *args):
+        """
+        run the methods of one stage, add its wall time and peak allocation
+        to stage_stats and call profile_callback
+        """
+        memory = self.profile != 'time'
+        if memory:
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            else:
+                tracemalloc.start()
+                base = 0
+        start = perf_counter()
+        try:
+            for method in methods:
+                getattr(self, method)(*args)
+        finally:
+            seconds = perf_counter() - start
+            peak = None
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                if not tracing:
+                    tracemalloc.stop()
+        record = self.stage_stats.setdefault(
+            stage, {'calls': 0, 'seconds': 0.0, 'peak_bytes': peak}
+        )
+        record['calls'] += 1
+        record['seconds'] += seconds
+        if peak is not None:
+            record['peak_bytes'] = max(record['peak_bytes'] or 0, peak)
+        if self.profile_callback is not None:
+            self.profile_callback(stage, {'seconds': seconds,
+                                          'peak_bytes': peak})
+
+    def finish(self):
+        """
+        drop the intermediates if compact, and cast the outputs to dtype
+        """
+        if self.compact:
+            self.drop_intermediates()
+        dtype = np.dtype(self.dtype)
+        for name in RRPResult.outputs:
+            data = getattr(self, name)
+            if data is not None and (data.dtypes != dtype).any():
+                setattr(self, name, data.astype(dtype))
+
+    def drop_intermediates(self):
+        """
+        free the actual cumulative assets return (days, assets)
+        it is computed again when needed
+        """
+        self.__r_actual_cum = None
+
+    def r_actual_cum(self):
+        """
+        actual cumulative assets return in each reset period, as np.ndarray
+        (days, assets), computed again if dropped
+        """
+        if self.__r_actual_cum is None:
+            self.get_logr_p()
+        return self.__r_actual_cum
+
+    def result(self, dtype='float64'):
+        """
+        the outputs as a RRPResult, without the inputs and intermediates
+        """
+        return RRPResult(self, dtype=dtype)
+
+    def memory_usage(self, inputs=False):
+        """
+        bytes used by the outputs and intermediates, as pd.Series
+        inputs are counted only if inputs, they are often shared with
+        other portfolios. reset_date and reset positions are shared with
+        the portfolios of the same reset calendar.
+        """
+        items = {name: getattr(self, name) for name in RRPResult.outputs}
+        items['ratio_solve_info'] = self.ratio_solve_info
+        items['reset_date'] = self.reset_date
+        items['r_actual_cum'] = self.__r_actual_cum
+        items['reset_position'] = self.__reset_position
+        items['reset_period'] = self.__reset_period
+        if self.__corr_cube is not self.corr:
+            items['corr_cube'] = self.__corr_cube.values
+        if inputs:
+            for name in ('logr', 'risk', 'corr', 'r_rolling', 'rf_rolling'):
+                items[name] = getattr(self, name)
+        return pd.Series({name: _nbytes(data)
+                          for name, data in items.items()})
+
+    def renew(self, name, change):
+        """
+        renew one input, then only compute the stages depending on it
+        """
+        setattr(self, name, change)
+        if name == 'corr':
+            # convert again, change may be the same object changed in place
+            self.__corr_source = None
+        if name in ('risk', 'corr', 'memo'):
+            # hashed again, change may be the same object changed in place
+            self.__memo_source = None
+            self.__appended = False
         self.check_inputs()
         self.useful_data()
-        self.construct()
+        self.update({name})
+
+    def new_ratio_fixed(self, change):
+        self.renew('ratio_fixed', change)
+
+    def new_risk_budget(self, change):
+        self.renew('risk_budget', change)
 
     def new_logr(self, change):
-        self.logr = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('logr', change)
 
     def new_risk(self, change):
-        self.risk = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('risk', change)
 
     def new_corr(self, change):
-        self.corr = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('corr', change)
 
     def new_first_reset_date(self, change):
-        self.first_reset_date = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('first_reset_date', change)
 
     def new_reset_months(self, change):
-        self.reset_months = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('reset_months', change)
 
     def new_reset_shift_mode(self, change):
-        self.reset_shift_mode = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('reset_shift_mode', change)
 
     def new_target_risk(self, change):
-        self.target_risk = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('target_risk', change)
 
     def new_target_return(self, change):
-        self.target_return = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('target_return', change)
 
     def new_leverage_fixed(self, change):
-        self.leverage_fixed = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('leverage_fixed', change)
 
     def new_usekelly(self, change):
-        self.usekelly = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('usekelly', change)
 
     def new_rf_rolling(self, change):
-        self.rf_rolling = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('rf_rolling', change)
 
     def new_r_rolling(self, change):
-        self.r_rolling = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('r_rolling', change)
 
     def new_leverage_limit(self, change):
-        self.leverage_limit = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('leverage_limit', change)
 
     def new_get_actual(self, change):
-        self.get_actual = change
-        self.check_inputs()
-        self.useful_data()
-        self.construct()
+        self.renew('get_actual', change)
 
-    @staticmethod
-    def month_interval(date1, date2):
-        """
-        function month_interval
-        date2 should be after date1
-        if day2 < day1, one month will be deducted
-        """
-        if date1 >= date2:
-            raise ValueError('date2 should be after date1')
-        year1 = date1.year
-        year2 = date2.year
-        month1 = date1.month
-        month2 = date2.month
-        day1 = date1.day
-        day2 = date2.day
-        return (year2-year1)*12 + (month2-month1) - (day2 < day1)
+    def new_compact(self, change):
+        self.renew('compact', change)
+
+    def new_dtype(self, change):
+        self.renew('dtype', change)
+
+    def new_profile(self, change):
+        self.renew('profile', change)
+
+    def new_profile_callback(self, change):
+        self.renew('profile_callback', change)
+
+    def new_memo(self, change):
+        self.renew('memo', change)
+
+    month_interval = staticmethod(month_interval)
+
+    def get_reset_calendar(self):
+        """
+        reset dates and the reset period of each day, see reset_calendar
+        shared with other instances with the same index and reset setting
+        """
+        calendar = reset_calendar(self.index, self.first_reset_date,
+                                  self.reset_months, self.reset_shift_mode)
+        self.sample_month_interval = calendar['sample_month_interval']
+        self.reset_times = calendar['reset_times']
+        self.__reset_points = calendar['reset_points']
+        self.reset_date = calendar['reset_date']
+        self.__reset_position = calendar['reset_position']
+        self.__reset_period = calendar['reset_period']
 
     def get_sample_month_interval(self):
         self.sample_month_interval = self.month_interval(self.first_reset_date,
                                                          self.last_day)
 
     def get_reset_points(self):
-        reset_times = ((self.sample_month_interval) // self.reset_months
-                       + 1)
-        reset_points = (pd.date_range(
-            start=(self.first_reset_date-timedelta(days=(self.first_reset_date.
-                                                         day-1))),
-            periods=reset_times, freq='{}MS'.format(self.reset_months)
-        ) + timedelta(days=(self.first_reset_date.day-1)))
-        self.__reset_points = reset_points
-        self.reset_times = reset_times
-
-    def get_reset_date(self):
-        """
-        if a reset point is a trading day, take it as reset_date
-        else take the first trading day after(before) the reset
-        point as reset_date
-        also add the first_day as the first actual reset date
-        """
-        reset_points = self.__reset_points
-        reset_date_list = list(range(self.reset_times))
-        for i in range(len(reset_points)):
-            day_diff = self.index - reset_points[i]
-            # 'after' mode
-            if self.reset_shift_mode in ('after', 'a', 'front', 'f'):
-                day_shift = day_diff[day_diff >= timedelta(days=0)].min()
-            # 'before' mode
-            if self.reset_shift_mode in ('before', 'back', 'b'):
-                day_shift = day_diff[day_diff <= timedelta(days=0)].max()
-            reset_date_list[i] = reset_points[i] + day_shift
-        if self.first_day != self.first_reset_date:
-            reset_date_list.insert(0, self.first_day)
-        self.reset_date = pd.DatetimeIndex(reset_date_list)
-
-    def get_last_reset_date(self):
-        """
-        last_reset_date: DataFrame of the last reset date for each trade day
-        NB! use reset_date but not last_reset_date sometimes is for
-        faster calculations
-        """
-        last_reset_date = pd.DataFrame(index=self.index)
-        last_reset_date.loc[self.reset_date, 'last_reset_date'] = \
-            list(self.reset_date)
-        last_reset_date.ffill(inplace=True)
-        self.__last_reset_date = last_reset_date
+        """
+        add the reset points up to the last day to the known ones
+        """
+        points = reset_points(self.first_reset_date,
+                              self.sample_month_interval // self.reset_months
+                              + 1, self.reset_months,
+                              start=len(self.__reset_points))
+        # a point after the last day is added by a later append
+        points = points[points <= self.last_day]
+        if len(points):
+            self.__reset_points = self.__reset_points.append(points)
+        self.reset_times = len(self.__reset_points)
 
     def get_ratio(self):
-        ratio = pd.DataFrame(index=self.index)
+        ratio_reset, self.ratio_solve_info = self.ratio_at(self.reset_date)
+        ratio = pd.DataFrame(np.NaN, index=self.index,
+                             columns=self.logr_names)
+        ratio.loc[self.reset_date, self.logr_names] = ratio_reset
+        ratio.ffill(inplace=True)
+        self.ratio = ratio
+
+    def ratio_at(self, dates, ratio_before=None):
+        """
+        ratio of assets on reset dates, as np.ndarray (dates, assets)
+        ratio_before: the ratio of the reset date before dates, if any, the
+        solver starts from it
+        return [ratio, solve info of the risk parity solver or None]
+        """
         # fixed ration portfolio
         if self.ratio_fixed:
-            i = 0
-            for name in self.logr_names:
-                ratio[name] = self.ratio_fixed[i]
-                i = i + 1
+            ratio_reset = np.tile(np.asarray(self.ratio_fixed, dtype=float),
+                                  (len(dates), 1))
+            return [ratio_reset, None]
         # risk parity portfolio
+        array_vol = self.risk.to_numpy(dtype=float)[self.rows_of(dates)]
+        # for 2 assets, equal risk contribution is inverse volatility
+        if len(self.logr_names) == 2 and self.risk_budget is None:
+            ratio_reset = (1/array_vol) / np.nansum(1/array_vol, axis=1,
+                                                    keepdims=True)
+            return [ratio_reset, None]
+        # solve the reset dates in order, in at most 4 batches, each batch
+        # starts from the solution of the reset date before it (more
+        # batches cost more than the sweeps they save). use the covariance
+        # from risk and corr of the reset dates
+        memo = self.used_memo()
+        if memo is None:
+            array_cov = (array_vol[:, :, None] * self.corr_at(dates) *
+                         array_vol[:, None, :])
         else:
-            # TODO: get ratio_reset for cases that number of assets more than 2
-            if len(self.logr_names) == 2:
-                ratio_reset = (self.risk.loc[self.reset_date, ].
-                               apply(lambda x: (1/x) / (1/x).sum(), axis=1))
-            elif len(self.logr_names) > 2:
-                raise UnfinishedFeature(
-                    'unfinished for cases that number of assets more than 2'
-                )
-            i = 0
-            for name in self.logr_names:
-                ratio[name] = np.NaN
-                ratio.loc[self.reset_date, name] = ratio_reset.iloc[:, i]
-                ratio.ffill(inplace=True)
-                i = i + 1
-        self.ratio = ratio
+            array_cov = memo.cov(self.risk, self.corr, self.__corr_cube,
+                                 dates, self.memo_source(memo))
+        ratio_reset, info = risk_parity_ratio(
+            array_cov, budget=self.risk_budget, ratio_init=ratio_before,
+            warm_start=True, warm_block=max(8, -(-len(dates) // 4))
+        )
+        if not info['converged'].all():
+            print('risk parity ratio not converged on some reset dates, ' +
+                  'see ratio_solve_info')
+        return [ratio_reset, pd.DataFrame(info, index=dates)]
 
     def get_leverage(self):
         leverage = pd.DataFrame(index=self.index)
+        leverage['leverage'] = np.NaN
+        leverage.loc[self.reset_date, 'leverage'] = self.leverage_at(
+            self.reset_date, self.ratio.loc[self.reset_date].to_numpy()
+        )
+        leverage.ffill(inplace=True)
+        self.leverage = leverage
+
+    def leverage_at(self, dates, ratio_reset, limit=True):
+        """
+        leverage on reset dates with the ratio of the reset dates
+        return np.ndarray (dates,), the limit of leverage is applied if limit
+        """
         # different leverage setting
         if self.leverage_fixed:
-            leverage['leverage'] = self.leverage_fixed
+            leverage = np.full(len(dates), float(self.leverage_fixed))
         elif self.usekelly:
-            leverage['leverage'] = np.NaN
-            for a_reset_date in self.reset_date:
-                leverage.loc[a_reset_date] = (
-                    ((self.r_rolling.loc[a_reset_date] *
-                      self.ratio.loc[a_reset_date]).sum() -
-                     self.rf_rolling.loc[a_reset_date])[0] /
-                    portfolio_risk(data_corr=self.corr.loc[a_reset_date],
-                                   data_vol=self.risk.loc[a_reset_date],
-                                   data_ratio=self.ratio.loc[a_reset_date])**2
-                )
-            leverage.ffill(inplace=True)
+            r_reset = np.nansum(
+                self.r_rolling.loc[dates, self.logr_names].to_numpy() *
+                ratio_reset, axis=1
+            )
+            rf_reset = self.rf_rolling.loc[dates].iloc[:, 0].to_numpy()
+            leverage = ((r_reset - rf_reset) /
+                        self.portfolio_risk_at(dates, ratio_reset)**2)
         elif self.target_risk:
-            leverage['leverage'] = np.NaN
-            for a_reset_date in self.reset_date:
-                leverage.loc[a_reset_date] = self.target_risk / (
-                    portfolio_risk(data_corr=self.corr.loc[a_reset_date],
-                                   data_vol=self.risk.loc[a_reset_date],
-                                   data_ratio=self.ratio.loc[a_reset_date])
-                )
-            leverage.ffill(inplace=True)
+            leverage = (self.target_risk /
+                        self.portfolio_risk_at(dates, ratio_reset))
         elif self.target_return:
-            leverage['leverage'] = np.NaN
-            for a_reset_date in self.reset_date:
-                leverage.loc[a_reset_date] = np.exp(self.target_return - (
-                    self.r_rolling.loc[a_reset_date] *
-                    self.ratio.loc[a_reset_date]).sum())
-            leverage.ffill(inplace=True)
+            leverage = np.exp(self.target_return - np.nansum(
+                self.r_rolling.loc[dates, self.logr_names].to_numpy() *
+                ratio_reset, axis=1
+            ))
         else:
-            leverage['leverage'] = 1
+            leverage = np.ones(len(dates))
         # apply the limit of leverage
-        if self.leverage_limit:
-            leverage.loc[leverage['leverage'] > self.leverage_limit] = (
-                self.leverage_limit
-            )
-        self.leverage = leverage
+        if self.leverage_limit and limit:
+            leverage[leverage > self.leverage_limit] = self.leverage_limit
+        return leverage
+
+    def leverage_grid(self, leverage_fixed=None, target_risk=None,
+                      leverage_limit=None):
+        """
+        logr_p of this portfolio for many leverage settings at once, without
+        constructing a RRP for each. the ratio and reset dates are kept.
+          - leverage_fixed: list of fixed leverage, or
+          - target_risk: list of target risk (risk and corr needed), or
+              neither for the leverage setting of this portfolio.
+          - leverage_limit: number, list or np.ndarray (broadcast with the
+              list above), default the leverage_limit of this portfolio.
+        return [logr_p, grid]: logr_p is pd.DataFrame (days, settings), grid
+        is pd.DataFrame, one row for each column of logr_p, the settings
+        and 'out of money'.
+        in a reset period, the actual cumulative return of the portfolio is
+        linear in leverage, so it is computed once without leverage and
+        scaled for all settings.
+        """
+        if leverage_fixed is not None and target_risk is not None:
+            raise InputError('input "leverage_fixed" or "target_risk", not '
+                             'both')
+        reset_rows = self.reset_rows()
+        dates = self.index[reset_rows]
+        ratio_reset = self.ratio.to_numpy()[reset_rows]
+        # leverage (reset dates, settings) before the limit
+        grid = {}
+        if leverage_fixed is not None:
+            grid['leverage_fixed'] = np.asarray(leverage_fixed, dtype=float)
+            leverage = np.tile(grid['leverage_fixed'], (len(dates), 1))
+        elif target_risk is not None:
+            grid['target_risk'] = np.asarray(target_risk, dtype=float)
+            leverage = (grid['target_risk'] /
+                        self.portfolio_risk_at(dates, ratio_reset)[:, None])
+        else:
+            leverage = self.leverage_at(dates, ratio_reset,
+                                        limit=False)[:, None]
+        if leverage_limit is None:
+            # no limit if the limit of this portfolio is 0, as leverage_at
+            leverage_limit = self.leverage_limit or None
+        if leverage_limit is not None:
+            grid['leverage_limit'] = np.asarray(leverage_limit, dtype=float)
+            leverage, limit = np.broadcast_arrays(leverage,
+                                                  grid['leverage_limit'])
+            leverage = np.where(leverage > limit, limit, leverage)
+        grid = pd.DataFrame({name: np.broadcast_to(value, leverage.shape[1:])
+                             for name, value in grid.items()},
+                            index=range(leverage.shape[1]))
+        # for each day, its reset period in reset_rows
+        period = np.searchsorted(reset_rows, np.arange(len(self.index)),
+                                 side='right') - 1
+        # cumulative return of the portfolio without leverage, (days,)
+        r_cum = segment_cumsum(self.logr.to_numpy(dtype=float), reset_rows)
+        np.expm1(r_cum, out=r_cum)
+        r_cum *= ratio_reset[period]
+        r_p_cum = np.nansum(r_cum, axis=1)[:, None] * leverage[period]
+        grid['out of money'] = (r_p_cum < -1).any(axis=0)
+        logr_p = pd.DataFrame(self.logr_p_of_cum(r_p_cum, reset_rows),
+                              index=self.index, columns=grid.index)
+        return [logr_p, grid]
 
     def get_logr_p(self):
-        leverage_tmp = pd.DataFrame(index=self.index)
-        for name in self.logr_names:
-            leverage_tmp[name] = self.leverage['leverage']
         # get actual cumulative assets return in one reset period
         # actual means ratio and leverage are used,
         # not the original return assets
-        logr_with_last_reset_date = self.logr.copy()
-        logr_with_last_reset_date['last_reset_date'] = self.__last_reset_date
-        logr_cum = logr_with_last_reset_date.groupby('last_reset_date'). \
-            cumsum()
-        r_actual_cum = (np.exp(logr_cum)-1)*self.ratio*leverage_tmp
+        # all steps are done in place on one (days, assets) array
+        logr = self.logr.to_numpy(dtype=float)
+        reset_rows = self.reset_rows()
+        r_actual_cum = segment_cumsum(logr, reset_rows)
+        self.__logr_cum_last = np.nansum(logr[reset_rows[-1]:], axis=0)
+        np.expm1(r_actual_cum, out=r_actual_cum)
+        r_actual_cum *= self.ratio.to_numpy()
+        # leverage (days, 1) is broadcast to all assets
+        r_actual_cum *= self.leverage.to_numpy()
+        logr_p, self.out_of_money = self.logr_p_of(r_actual_cum, reset_rows)
+        self.logr_p = pd.DataFrame(logr_p, index=self.index,
+                                   columns=['portfolio'])
+        self.__r_actual_cum = r_actual_cum
+
+    @staticmethod
+    def logr_p_of(r_actual_cum, reset_rows, r_actual_cum_before=None):
+        """
+        portfolio log return from actual cumulative assets return
+        r_actual_cum_before: the row before r_actual_cum, if any
+        return [logr_p, out_of_money]
+        """
+        r_p_cum = np.nansum(r_actual_cum, axis=1)
         # check if out of money
-        if (r_actual_cum.sum(axis=1) < -1).sum() > 0:
+        out_of_money = bool((r_p_cum < -1).any())
+        if out_of_money:
             print(
                 'one asset out of money, please reduce leverage or set a limit'
             )
+        r_p_cum_before = (None if r_actual_cum_before is None
+                          else np.nansum(r_actual_cum_before))
+        return [RRP.logr_p_of_cum(r_p_cum, reset_rows, r_p_cum_before),
+                out_of_money]
+
+    @staticmethod
+    def logr_p_of_cum(r_p_cum, reset_rows, r_p_cum_before=None):
+        """
+        portfolio log return from actual cumulative portfolio return, (days,)
+        or (days, portfolios)
+        r_p_cum_before: the row before r_p_cum, if any
+        """
         # get cumulative portfolio log return in one reset period
-        logr_p_cum = np.log(r_actual_cum.sum(axis=1)+1)
-        # portfolio log return
-        logr_p = pd.DataFrame(index=self.index)
+        logr_p_cum = np.log1p(r_p_cum)
         # for not on reset date
-        logr_p.loc[:, 'portfolio'] = logr_p_cum.diff()
+        logr_p = np.empty(logr_p_cum.shape)
+        logr_p[1:] = np.diff(logr_p_cum, axis=0)
+        if r_p_cum_before is None:
+            logr_p[:1] = np.NaN
+        else:
+            logr_p[:1] = logr_p_cum[:1] - np.log1p(r_p_cum_before)
         # for on reset date, cover the value above
-        logr_p.loc[self.reset_date, 'portfolio'] = \
-            logr_p_cum.loc[self.reset_date]
-        self.logr_p = logr_p
-        self.__r_actual_cum = r_actual_cum
+        logr_p[reset_rows] = logr_p_cum[reset_rows]
+        return logr_p
 
     def get_ratio_actual(self):
-        ratio_actual_no_adjust = (self.__r_actual_cum+1)*self.ratio
-        ratio_actual = ratio_actual_no_adjust.apply(lambda x: x / x.sum(),
-                                                    axis=1)
+        self.ratio_actual = pd.DataFrame(
+            self.ratio_actual_of(self.r_actual_cum(), self.ratio.to_numpy()),
+            index=self.index, columns=self.logr_names
+        )
+
+    @staticmethod
+    def ratio_actual_of(r_actual_cum, ratio):
+        # assets are the last axis, (days, assets) or stacked
+        ratio_actual = (r_actual_cum+1)*ratio
+        ratio_actual /= np.nansum(ratio_actual, axis=-1, keepdims=True)
         # if ratio_actual have any negative value at one date,
         # the ratio is meaningless, treat this date as missing value
-        ratio_actual.loc[(ratio_actual < 0).sum(axis=1) > 0] = np.NaN
-        self.ratio_actual = ratio_actual
+        ratio_actual[(ratio_actual < 0).any(axis=-1)] = np.NaN
+        return ratio_actual
+
+    def reset_rows(self):
+        """
+        positions of reset dates in index, sorted and unique
+        """
+        position = self.__reset_position
+        return np.unique(position[position < len(self.index)])
 
     def get_risk_p(self):
         """
@@ -489,12 +773,9 @@ class RRP(object):
         """
         risk_p = pd.DataFrame(index=self.index)
         risk_p['portfolio'] = np.NaN
-        for a_reset_date in self.reset_date:
-            risk_p.loc[a_reset_date] = (
-                portfolio_risk(data_corr=self.corr.loc[a_reset_date],
-                               data_vol=self.risk.loc[a_reset_date],
-                               data_ratio=self.ratio.loc[a_reset_date])
-            )
+        risk_p.loc[self.reset_date, 'portfolio'] = self.portfolio_risk_at(
+            self.reset_date, self.ratio.loc[self.reset_date].to_numpy()
+        )
         risk_p.ffill(inplace=True)
         self.risk_p = risk_p
 
@@ -503,15 +784,369 @@ class RRP(object):
         difference: use ratio_actual
         """
         risk_p_actual = pd.DataFrame(index=self.index)
-        risk_p_actual['portfolio'] = np.NaN
-        for a_date in self.index:
-            risk_p_actual.loc[a_date] = (
-                portfolio_risk(data_corr=self.corr.loc[a_date],
-                               data_vol=self.risk.loc[a_date],
-                               data_ratio=self.ratio_actual.loc[a_date])
-            )
+        risk_p_actual['portfolio'] = self.portfolio_risk_at(
+            self.index, self.ratio_actual.to_numpy(), memo=False
+        )
         self.risk_p_actual = risk_p_actual
 
+    def append(self, logr, risk=None, corr=None, r_rolling=None,
+               rf_rolling=None):
+        """
+        append new days after the last day, without constructing the whole
+        portfolio again.
+          - logr: log return of assets of the new days, pd.DataFrame.
+          - risk, r_rolling, rf_rolling: pd.DataFrame of the new days, if
+              they are used.
+          - corr: correlation of the new days, MultiIndex pd.DataFrame,
+              CorrCube or np.ndarray (days, assets, assets), if it is used.
+              after append, corr is kept as a CorrCube.
+        a reset date is added when the new days pass a reset point. only
+        the rows from the first new day (or from the new reset date in
+        'before' mode) are computed. logr, risk, the outputs and the
+        intermediates grow in buffers (see grow), so a day costs the same
+        for any number of days before it.
+        """
+        if list(logr.columns) != self.logr_names:
+            raise DataFrameError('"logr" have different col')
+        if not is_datetime64_any_dtype(logr.index):
+            raise DataFrameError('the index of "logr" is not datetime')
+        if (logr.index <= self.last_day).any():
+            raise DateValueError('the new days must be after the last day')
+        # check all the inputs before changing anything, a failed append
+        # leaves the portfolio as it was
+        if self.risk is not None:
+            if risk is None:
+                raise InputError('"risk" of the new days is needed')
+            if not risk.index.equals(logr.index):
+                raise DataFrameError('"logr" and "risk" have different index')
+            if list(risk.columns) != list(self.risk.columns):
+                raise DataFrameError('"risk" have different col')
+        corr_values = None
+        if self.corr is not None:
+            if corr is None:
+                raise InputError('"corr" of the new days is needed')
+            corr_values = self.corr_values_of(corr, logr.index)
+        used = self.append_inputs()
+        for name, frame in (('r_rolling', r_rolling),
+                            ('rf_rolling', rf_rolling)):
+            if name not in used:
+                continue
+            if frame is None:
+                # the old frame may already cover the new days
+                if not logr.index.isin(getattr(self, name).index).all():
+                    raise InputError('"{}" of the new days is needed'.
+                                     format(name))
+            elif not logr.index.isin(frame.index).all():
+                raise DataFrameError('"logr" and "{}" have different index'.
+                                     format(name))
+        n_old = len(self.index)
+        # the intermediates of the old days are needed
+        self.r_actual_cum()
+        self.index = _dates_of(
+            self.grow('index', self.index.asi8, n_old, logr.index.asi8),
+            self.index
+        )
+        self.logr = self.frame_of(
+            self.grow('logr', self.logr.to_numpy(dtype=float), n_old,
+                      logr.to_numpy(dtype=float)),
+            self.logr.columns
+        )
+        if risk is not None:
+            self.risk = self.frame_of(
+                self.grow('risk', self.risk.to_numpy(dtype=float), n_old,
+                          risk.to_numpy(dtype=float)),
+                self.risk.columns
+            )
+        if r_rolling is not None:
+            self.r_rolling = pd.concat([self.r_rolling, r_rolling])
+        if rf_rolling is not None:
+            self.rf_rolling = pd.concat([self.rf_rolling, rf_rolling])
+        if corr_values is not None:
+            self.append_corr(corr_values, logr.index)
+        self.__memo_source = None
+        self.__appended = True
+        self.last_day = self.index[-1]
+        self.N = len(self.index)
+        # new reset dates
+        reset_times = self.reset_times
+        self.get_sample_month_interval()
+        self.get_reset_points()
+        new_points = self.__reset_points[reset_times:]
+        if self.reset_shift_mode in ('before', 'back', 'b'):
+            position = self.index.searchsorted(new_points, side='right') - 1
+        else:
+            position = self.index.searchsorted(new_points, side='left')
+        if len(position):
+            self.reset_date = self.reset_date.append(self.index[position])
+            self.__reset_position = np.append(self.__reset_position,
+                                              position)
+        start = min([n_old] + list(position))
+        if self.profile:
+            self.run_profiled('append', ('extend_from',), start)
+        else:
+            self.extend_from(start)
+        self.finish()
+
+    def append_inputs(self):
+        """
+        names of the inputs this portfolio uses, their new days are needed
+        by append (r_rolling and rf_rolling only if they do not cover the new
+        days already)
+        """
+        names = ['logr']
+        if self.risk is not None:
+            names.append('risk')
+        if self.corr is not None:
+            names.append('corr')
+        if self.usekelly or self.target_return:
+            names.append('r_rolling')
+        if self.usekelly:
+            names.append('rf_rolling')
+        return names
+
+    def corr_values_of(self, corr, dates):
+        """
+        correlation of new days as np.ndarray (days, assets, assets), checked
+        against dates
+        """
+        if isinstance(corr, pd.DataFrame):
+            corr = CorrCube.from_frame(corr)
+        if isinstance(corr, CorrCube):
+            if not corr.index.equals(pd.DatetimeIndex(dates)):
+                raise DataFrameError('"logr" and "corr" have different index')
+            values = corr.dense()
+        else:
+            values = np.asarray(corr, dtype=float)
+        n = len(self.logr_names)
+        if values.shape != (len(dates), n, n):
+            raise DataFrameError('"corr" should have shape (days, {0}, {0})'.
+                                 format(n))
+        return values
+
+    def append_corr(self, corr, dates):
+        """
+        append correlation of new days to the CorrCube of this portfolio
+        the CorrCube given by user is not changed
+        """
+        values = self.corr_values_of(corr, dates)
+        # a new CorrCube at the first append, then it grows in place
+        if self.__corr_cube is not self.__corr_own:
+            cube = self.__corr_cube
+            self.__corr_cube = CorrCube(cube.values, cube.index,
+                                        cube.columns, triu=cube.triu)
+            self.__corr_own = self.__corr_cube
+        self.__corr_cube.append(values, dates)
+        self.corr = self.__corr_cube
+        self.__corr_source = self.corr
+
+    def extend_from(self, start):
+        """
+        compute the rows from position start to the last day
+        start must be a reset date, or the first row not computed yet
+        the rows are written in buffers grown by doubling (see grow), the
+        outputs are views of them
+        """
+        tail = self.index[start:]
+        # positions of the reset dates from start, in tail
+        position = self.__reset_position
+        position = position[np.searchsorted(position, start):]
+        reset_rows = np.unique(position[position < len(self.index)]) - start
+        tail_reset = tail[reset_rows]
+        # the reset period of each day
+        self.__reset_period = self.grow(
+            'reset_period', self.__reset_period, start,
+            np.searchsorted(self.__reset_position,
+                            np.arange(start, len(self.index)),
+                            side='right') - 1
+        )
+        # ratio and leverage, missing values are filled forward
+        ratio = np.full((len(tail), len(self.logr_names)), np.NaN)
+        leverage = np.full((len(tail), 1), np.NaN)
+        if len(reset_rows):
+            ratio_reset, info = self.ratio_at(
+                tail_reset,
+                self.ratio.to_numpy()[start-1] if start else None
+            )
+            ratio[reset_rows] = ratio_reset
+            if info is not None:
+                self.ratio_solve_info = pd.concat([
+                    self.ratio_solve_info[
+                        self.ratio_solve_info.index < tail[0]
+                    ],
+                    info
+                ])
+        ratio = self.ffill_from(self.ratio, start, ratio)
+        if len(reset_rows):
+            leverage[reset_rows, 0] = self.leverage_at(tail_reset,
+                                                       ratio[reset_rows])
+        leverage = self.ffill_from(self.leverage, start, leverage)
+        self.ratio = self.frame_of(
+            self.grow('ratio', self.ratio.to_numpy(), start, ratio),
+            self.ratio.columns
+        )
+        self.leverage = self.frame_of(
+            self.grow('leverage', self.leverage.to_numpy(), start, leverage),
+            self.leverage.columns
+        )
+        # cumulative assets return in the reset period, go on from the
+        # last computed day if start is not a reset date
+        logr = self.logr.to_numpy(dtype=float)[start:]
+        r_actual_cum = segment_cumsum(logr, reset_rows,
+                                      initial=self.__logr_cum_last)
+        if len(reset_rows):
+            self.__logr_cum_last = np.nansum(logr[reset_rows[-1]:], axis=0)
+        else:
+            self.__logr_cum_last = (self.__logr_cum_last +
+                                    np.nansum(logr, axis=0))
+        np.expm1(r_actual_cum, out=r_actual_cum)
+        r_actual_cum *= ratio
+        r_actual_cum *= leverage
+        logr_p, out_of_money = self.logr_p_of(
+            r_actual_cum, reset_rows,
+            self.__r_actual_cum[start-1] if start else None
+        )
+        # the old days before start keep their flag, checked again only if
+        # some old days are computed again
+        if self.out_of_money and start < len(self.__r_actual_cum):
+            self.out_of_money = bool(
+                (np.nansum(self.__r_actual_cum[:start], axis=1) < -1).any()
+            )
+        self.out_of_money = out_of_money or bool(self.out_of_money)
+        self.logr_p = self.frame_of(
+            self.grow('logr_p', self.logr_p.to_numpy(), start,
+                      logr_p[:, None]),
+            self.logr_p.columns
+        )
+        self.__r_actual_cum = self.grow('r_actual_cum', self.__r_actual_cum,
+                                        start, r_actual_cum)
+        if not self.get_actual:
+            return
+        # actual ratio and risk
+        ratio_actual = self.ratio_actual_of(r_actual_cum, ratio)
+        self.ratio_actual = self.frame_of(
+            self.grow('ratio_actual', self.ratio_actual.to_numpy(), start,
+                      ratio_actual),
+            self.ratio_actual.columns
+        )
+        risk_p = np.full((len(tail), 1), np.NaN)
+        if len(reset_rows):
+            risk_p[reset_rows, 0] = self.portfolio_risk_at(tail_reset,
+                                                           ratio_reset)
+        self.risk_p = self.frame_of(
+            self.grow('risk_p', self.risk_p.to_numpy(), start,
+                      self.ffill_from(self.risk_p, start, risk_p)),
+            self.risk_p.columns
+        )
+        risk_p_actual = self.portfolio_risk_at(tail, ratio_actual,
+                                               memo=False)
+        self.risk_p_actual = self.frame_of(
+            self.grow('risk_p_actual', self.risk_p_actual.to_numpy(), start,
+                      risk_p_actual[:, None]),
+            self.risk_p_actual.columns
+        )
+
+    @staticmethod
+    def ffill_from(data, start, tail):
+        """
+        missing values of tail (np.ndarray) filled forward, from the row of
+        data before start
+        """
+        if start:
+            tail = np.concatenate([data.to_numpy(dtype=float)[start-1:start],
+                                   tail])
+        tail = pd.DataFrame(tail).ffill().to_numpy()
+        return tail[1:] if start else tail
+
+    def grow(self, name, data, start, tail):
+        """
+        rows of data (np.ndarray) before start, then rows of tail, as a
+        view of the buffer of name. the buffer grows by doubling, so adding
+        a few rows costs the same for any number of days. a new buffer is
+        taken if data is not the view of the buffer, if the buffer is full,
+        or if start is before its last row (frames taken before append are
+        never written).
+        """
+        n = start + len(tail)
+        buffer, end = self.__buffers.get(name, [None, 0])
+        if (buffer is None or start < end or n > len(buffer) or
+                len(data) != end or not np.may_share_memory(data, buffer)):
+            dtype = (np.dtype(self.dtype) if name in RRPResult.outputs
+                     else tail.dtype)
+            buffer = np.empty((max(2*len(data), n),) + tail.shape[1:],
+                              dtype=dtype)
+            buffer[:start] = data[:start]
+        buffer[start:n] = tail
+        self.__buffers[name] = [buffer, n]
+        return buffer[:n]
+
+    def frame_of(self, values, columns):
+        """
+        pd.DataFrame of values (days, columns) without copy, index be index
+        """
+        return pd.DataFrame(values, index=self.index, columns=columns,
+                            copy=False)
+
+    def rows_of(self, dates):
+        """
+        positions of dates in index (and risk), by binary search in the
+        sorted index, so no hash table of a grown index is built
+        """
+        dates = pd.DatetimeIndex(dates)
+        rows = self.index.searchsorted(dates)
+        found = rows < len(self.index)
+        found[found] = self.index.asi8[rows[found]] == dates.asi8[found]
+        if not found.all():
+            raise KeyError(dates[~found])
+        return rows
+
+    def corr_at(self, dates):
+        """
+        stacked correlation matrices of dates, shape (dates, assets, assets)
+        """
+        return self.__corr_cube.take(dates)
+
+    def used_memo(self):
+        """
+        the RiskMemo used by this portfolio, None if memo is False or risk
+        and corr are grown by append (only this portfolio has them)
+        """
+        if self.__appended:
+            return None
+        if self.memo is True:
+            return risk_memo
+        if isinstance(self.memo, RiskMemo):
+            return self.memo
+        return None
+
+    def memo_source(self, memo):
+        """
+        the source of risk and corr in memo, hashed once after they are
+        given (construct, new_risk, new_corr, new_memo or append)
+        """
+        if self.__memo_source is None:
+            self.__memo_source = memo.source(self.risk, self.corr,
+                                             self.__corr_cube)
+        return self.__memo_source
+
+    def portfolio_risk_at(self, dates, array_ratio, memo=True):
+        """
+        portfolio risk of dates with the ratio (dates, assets) of the dates,
+        as np.ndarray (dates,)
+        one stacked computation instead of portfolio_risk for each date.
+        kept in the RiskMemo if memo, not for the ratio of every day
+        (actual ratio), which is seldom computed again.
+        """
+        memo = self.used_memo() if memo else None
+        if memo is not None:
+            return memo.portfolio_risk(self.risk, self.corr,
+                                       self.__corr_cube, dates, array_ratio,
+                                       self.memo_source(memo))
+        return portfolio_risk_batch(
+            array_corr=self.corr_at(dates),
+            array_vol=self.risk.to_numpy(dtype=float)[self.rows_of(dates)],
+            array_ratio=array_ratio
+        )
+
     def __str__(self):
         info = ('the construction of portfolio finished, useful attributes: ' +
                 '\n sample_month_interval, ' +
@@ -527,3 +1162,15 @@ class RRP(object):
         return info
 
     __repr__ = __str__
+
+
+def _nbytes(data):
+    if data is None:
+        return 0
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(deep=True).sum())
+    if isinstance(data, pd.Index):
+        return int(data.memory_usage(deep=True))
+    if isinstance(data, CorrCube):
+        return int(data.values.nbytes)
+    return int(np.asarray(data).nbytes)
@@ -0,0 +1,61 @@
+__all__ = ['risk_corr', 'rolling_return']
+
+
+import numpy as np
+import pandas as pd
+from .class_corr import CorrCube
+from .class_estimator import CovEstimator
+from .customized_exceptions import DataFrameError
+
+
+def risk_corr(logr, window=250, halflife=None, periods=252, scale=100,
+              min_periods=None, estimator=None, triu=False):
+    """
+    estimate the inputs risk and corr of RRP from logr
+      - logr: log return of assets, pd.DataFrame.
+      - window, halflife, min_periods: see CovEstimator. rolling window of
+          window days if halflife is None, else EWMA.
+      - periods: number of days in one year, to annualize the volatility.
+      - scale: risk = annualized volatility * scale, default 100 as the
+          percent of implied volatility index (vix, move).
+      - estimator: a CovEstimator to go on from, e.g. the one of the days
+          before logr, it is updated in place. a new one if None.
+      - triu: store only the upper triangle in the CorrCube.
+    return [risk, corr, estimator]: risk is pd.DataFrame with the index and
+    columns of logr, corr is CorrCube, the estimate of each day uses the
+    days until this day (included).
+    """
+    if not isinstance(logr, pd.DataFrame):
+        raise DataFrameError('"logr" should be pd.DataFrame')
+    array_logr = logr.to_numpy(dtype=float)
+    T, n = array_logr.shape
+    if estimator is None:
+        estimator = CovEstimator(n, window=window, halflife=halflife,
+                                 min_periods=min_periods)
+    elif estimator.n != n:
+        raise DataFrameError('"logr" and "estimator" have different assets')
+    array_corr = np.empty((T, n, n))
+    array_vol = np.empty((T, n))
+    for t in range(T):
+        estimator.update(array_logr[t])
+        array_corr[t], array_vol[t] = estimator.corr()
+    array_vol *= np.sqrt(periods)*scale
+    risk = pd.DataFrame(array_vol, index=logr.index, columns=logr.columns)
+    corr = CorrCube(array_corr, logr.index, logr.columns, triu=triu)
+    return [risk, corr, estimator]
+
+
+def rolling_return(r, window=250, halflife=None, min_periods=None):
+    """
+    rolling yearly return from daily return r, the inputs r_rolling and
+    rf_rolling of RRP, e.g. rolling_return(rf) for rf.rolling(250).sum()
+      - r: daily return, pd.DataFrame or pd.Series.
+      - window: number of days summed, also the days of one year.
+      - halflife: if provided, window * EWMA mean of daily return.
+    """
+    if halflife is None:
+        return r.rolling(window, min_periods=min_periods).sum()
+    if min_periods is None:
+        min_periods = 0
+    return r.ewm(halflife=halflife, adjust=False,
+                 min_periods=min_periods).mean()*window
@@ -1,8 +1,11 @@
-__all__ = ['period', 'describe', 'ni', 'yearlyreturn', 'yearlyreturnm',
-           'exesssyearlyreturn', 'exesssyearlyreturnm', 'sr', 'srm', 'srf',
-           'srfm', 'var', 'es', 'drawdown', 'avedrawdown', 'maxdrawdown',
-           'portfolio_risk', 'period_4_plot', 'performance', 'performance1',
-           'performance2']
+__all__ = ['period', 'describe', 'describe_frame', 'ni', 'yearlyreturn',
+           'yearlyreturnm', 'exesssyearlyreturn', 'exesssyearlyreturnm', 'sr',
+           'srm', 'srf', 'srfm', 'var', 'es', 'drawdown', 'avedrawdown',
+           'maxdrawdown', 'drawdown_episodes', 'rolling_var_es', 'rolling_sr',
+           'rolling_var', 'rolling_es', 'rolling_maxdrawdown',
+           'performance_table', 'portfolio_risk', 'portfolio_risk_batch',
+           'risk_parity_ratio', 'segment_cumsum', 'period_4_plot',
+           'performance', 'performance1', 'performance2']
 
 
 # ----------------------------------------------------------------------------
@@ -13,7 +16,7 @@ def period(col, data):
     return the effective date period of one column
     """
     start = data[col].first_valid_index()
-    end = data[col].sort_index(ascending=False).first_valid_index()
+    end = data[col].last_valid_index()
     return([start, end])
 # how to use:
 # [start,end] = period('colname')
@@ -32,8 +35,8 @@ def describe(col, data):
     d['Mean'] = [data[col].mean()]
     # std
     d['Std.'] = [data[col].std()]
-    # mad
-    d['Mad'] = [data[col].mad()]
+    # mad (mean absolute deviation, Series.mad is removed in pandas 2)
+    d['Mad'] = [(data[col] - data[col].mean()).abs().mean()]
     # min
     d['Min'] = [data[col].min()]
     # max
@@ -58,6 +61,79 @@ def describe(col, data):
 # ----------------------------------------------------------------------------
 
 
+def describe_frame(data, lags=(1, 5, 10, 20), chunk=256):
+    """
+    return the period and basic statistical descriptions of all columns,
+    one row for each column, the same values as period and describe
+      - lags: lags of the autocorrelation, 'acf lag=k' columns.
+      - chunk: number of columns in one FFT.
+    the autocorrelations of all lags come from one FFT of each column, as
+    Series.autocorr (correlation of the pairs of days both not missing).
+    """
+    import numpy as np
+    import pandas as pd
+    array = data.to_numpy(dtype=float)
+    T, K = array.shape
+    valid = ~np.isnan(array)
+    has_valid = valid.any(axis=0)
+    first = np.argmax(valid, axis=0)
+    last = T - 1 - np.argmax(valid[::-1], axis=0)
+    mean = data.mean()
+    d = {'start': pd.Series(data.index[first]).where(has_valid).to_numpy(),
+         'end': pd.Series(data.index[last]).where(has_valid).to_numpy(),
+         'Nobs': data.count().to_numpy(),
+         'Mean': mean.to_numpy(),
+         'Std.': data.std().to_numpy(),
+         'Mad': (data - mean).abs().mean().to_numpy(),
+         'Min': data.min().to_numpy(),
+         'Max': data.max().to_numpy(),
+         'Skew': data.skew().to_numpy(),
+         'Excess Kurt': data.kurt().to_numpy()}
+    acf = np.full((len(lags), K), np.nan)
+    for a in range(0, K, chunk):
+        acf[:, a:a+chunk] = _autocorr_fft(array[:, a:a+chunk], lags)
+    for i, lag in enumerate(lags):
+        d['acf lag={}'.format(lag)] = acf[i]
+    return pd.DataFrame(d, index=data.columns)
+
+
+def _autocorr_fft(array, lags):
+    """
+    autocorrelation (lags, columns) of the columns of array, from the
+    cross-correlations of the centered values and the mask of valid days.
+    the inverse FFT is only evaluated at lags
+    """
+    import numpy as np
+    T = len(array)
+    lags = np.asarray(lags)
+    m = (~np.isnan(array)).astype(float)
+    with np.errstate(invalid='ignore'):
+        y = np.where(m > 0, array - np.nanmean(array, axis=0), 0)
+    # long enough that lags do not wrap around
+    n_fft = 1 << int(T + lags.max()).bit_length()
+    fm, fy, fy2 = [np.fft.rfft(a, n_fft, axis=0) for a in (m, y, y*y)]
+    # inverse of the real FFT at lags only, (lags, frequencies)
+    k = np.arange(n_fft // 2 + 1)
+    weight = np.where((k == 0) | (k == n_fft // 2), 1.0, 2.0) / n_fft
+    basis = weight*np.exp(2j*np.pi*np.outer(lags, k)/n_fft)
+
+    def xcorr(fa, fb):
+        # sum over t of a[t] * b[t+lag]
+        return (basis @ (np.conj(fa)*fb)).real
+
+    pairs = np.rint(xcorr(fm, fm))
+    s1, s2 = xcorr(fy, fm), xcorr(fm, fy)
+    q1, q2 = xcorr(fy2, fm), xcorr(fm, fy2)
+    p = xcorr(fy, fy)
+    with np.errstate(all='ignore'):
+        cov = p - s1*s2/pairs
+        var1 = q1 - s1**2/pairs
+        var2 = q2 - s2**2/pairs
+        acf = cov/np.sqrt(var1*var2)
+    acf[pairs < 2] = np.nan
+    return acf
+
+
 # function ni (no included)
 def ni(col, data):
     return(data.loc[:, data.columns != col])
@@ -70,64 +146,67 @@ def ni(col, data):
 
 # lr: log returns, main input.
 # lrf: log risk free rate
+# periods: number of periods in one year to annualize, 252 for daily
+#   returns, 12 for monthly returns (the *m functions), 252*390 for minute
+#   bars of a 390 minutes trading day
 # because of the characteristic of logarithm, profit, var and es
 #   reflect the relatively performances in log returns
 
 
 # function yearlyreturn
-def yearlyreturn(lr):
-    t = lr.mean()*252
+def yearlyreturn(lr, periods=252):
+    t = lr.mean()*periods
     return t
 
 
 # function yearlyreturnm
-def yearlyreturnm(lr):
-    t = lr.mean()*12
+def yearlyreturnm(lr, periods=12):
+    t = lr.mean()*periods
     return t
 
 
 # function exesssyearlyreturn
-def exesssyearlyreturn(lr, lrf):
-    t = (lr.mean()-lrf.mean())*252
+def exesssyearlyreturn(lr, lrf, periods=252):
+    t = (lr.mean()-lrf.mean())*periods
     return t
 
 
 # function exesssyearlyreturnm
-def exesssyearlyreturnm(lr, lrf):
-    t = (lr.mean()-lrf.mean())*12
+def exesssyearlyreturnm(lr, lrf, periods=12):
+    t = (lr.mean()-lrf.mean())*periods
     return t
 
 
 # function sr (yearly sharpe ratio (no risk free rate) for log returns)
-def sr(lr):
+def sr(lr, periods=252):
     import numpy as np
     s = lr.std()
-    t = (lr.mean()/s)*np.sqrt(252)
+    t = (lr.mean()/s)*np.sqrt(periods)
     return t
 
 
 # function srm
-def srm(lr):
+def srm(lr, periods=12):
     import numpy as np
     s = lr.std()
-    t = (lr.mean()/s)*np.sqrt(12)
+    t = (lr.mean()/s)*np.sqrt(periods)
     return t
 
 
 # function srf (yearly sharpe ratio for (excess) log returns)
 # use log risk-free rate to get the excess return
-def srf(lr, lrf):
+def srf(lr, lrf, periods=252):
     import numpy as np
     s = (lr-lrf).std()
-    t = ((lr.mean()-lrf.mean())/s)*np.sqrt(252)
+    t = ((lr.mean()-lrf.mean())/s)*np.sqrt(periods)
     return t
 
 
 # function srfm
-def srfm(lr, lrf):
+def srfm(lr, lrf, periods=12):
     import numpy as np
     s = (lr-lrf).std()
-    t = ((lr.mean()-lrf.mean())/s)*np.sqrt(12)
+    t = ((lr.mean()-lrf.mean())/s)*np.sqrt(periods)
     return t
 
 
@@ -178,21 +257,254 @@ def maxdrawdown(lr):
     return t
 
 
+# function drawdown_episodes (every drawdown episode, one pass)
+# lr can be a pd.Series or a pd.DataFrame (each column is one series)
+def drawdown_episodes(lr):
+    """
+    return [episodes, summary]
+      - episodes: pd.DataFrame, one row for each drawdown episode, columns
+          'column', 'peak' (last high), 'trough', 'recovery' (first day
+          back to the high, NaT if not yet), 'depth' (percentage drawdown
+          at trough), 'duration' (days from peak to recovery, or to the
+          last day), 'to trough' and 'to recover' (days, NaN if not yet).
+      - summary: pd.DataFrame, one row for each column, 'Avg.  DD', 'MDD'
+          (as avedrawdown and maxdrawdown), 'ulcer index' (root mean square
+          of drawdown), 'episodes' and 'longest' (max duration).
+    missing values keep the state of the day before. all columns are done
+    together in O(n), with one cumulative sum.
+    """
+    import numpy as np
+    import pandas as pd
+    array_lr, _ = _as_columns(lr)
+    T, K = array_lr.shape
+    index = pd.RangeIndex(T) if not hasattr(lr, 'index') else lr.index
+    if isinstance(lr, pd.DataFrame):
+        names = np.asarray(lr.columns, dtype=object)
+    else:
+        names = np.array([getattr(lr, 'name', 0)], dtype=object)
+    t = np.arange(T)
+    missing = np.isnan(array_lr)
+    clr = np.nancumsum(array_lr, axis=0)
+    clr_max = np.maximum.accumulate(np.where(missing, -np.inf, clr), axis=0)
+    log_dd = np.where(missing, np.nan, clr - clr_max)
+    # in drawdown or not, missing days take the last valid day
+    last_valid = np.maximum.accumulate(
+        np.where(missing, -1, t[:, None]), axis=0
+    )
+    cols = np.arange(K)
+    under = (last_valid >= 0) & (log_dd[np.maximum(last_valid, 0), cols] < 0)
+    # column by column, as one flat array
+    under_flat = under.T.ravel()
+    before = np.concatenate([[False], under_flat[:-1]])
+    before[::T] = False
+    start = np.flatnonzero(under_flat & ~before)
+    end = np.flatnonzero(~under_flat & before)
+    column = start // T
+    # the recovery of each episode is the next end in the same column
+    next_end = np.searchsorted(end, start)
+    recovered = next_end < len(end)
+    recovered[recovered] = end[next_end[recovered]] // T == column[recovered]
+    stop = (column + 1)*T
+    stop[recovered] = end[next_end[recovered]]
+    # depth and the first day of it, for each [start, stop)
+    value = np.append(np.nan_to_num(log_dd.T.ravel(), nan=0.0), 0)
+    bounds = np.ravel(np.column_stack([start, stop]))
+    if len(start):
+        depth = np.minimum.reduceat(value, bounds)[::2]
+        episode = np.cumsum(under_flat & ~before) - 1
+        at_depth = under_flat & (value[:-1] == depth[np.maximum(episode, 0)])
+        position = np.append(np.where(at_depth, np.arange(T*K), T*K), T*K)
+        trough = np.minimum.reduceat(position, bounds)[::2]
+    else:
+        depth = trough = start
+    start_row = start - column*T
+    peak_row = last_valid[start_row - 1, column]
+    trough_row = trough - column*T
+    recovery_row = np.where(recovered, stop - column*T, -1)
+    end_row = np.where(recovered, recovery_row, T - 1)
+    episodes = pd.DataFrame({
+        'column': names[column],
+        'peak': index[peak_row],
+        'trough': index[trough_row],
+        'recovery': pd.Series(index[np.maximum(recovery_row, 0)]).where(
+            recovered).to_numpy(),
+        'depth': np.expm1(depth),
+        'duration': end_row - peak_row,
+        'to trough': trough_row - peak_row,
+        'to recover': np.where(recovered, recovery_row - trough_row, np.nan),
+    })
+    dd = np.expm1(log_dd)
+    with np.errstate(all='ignore'):
+        summary = pd.DataFrame({
+            'Avg.  DD': np.nanmean(dd, axis=0),
+            'MDD': np.nanmin(dd, axis=0),
+            'ulcer index': np.sqrt(np.nanmean(dd**2, axis=0)),
+            'episodes': np.bincount(column, minlength=K),
+            'longest': pd.Series(episodes['duration'].to_numpy()).groupby(
+                column).max().reindex(cols).fillna(0).to_numpy(dtype=int),
+        }, index=names)
+    return [episodes, summary]
+
+
+# rolling versions of sr, var, es and maxdrawdown
+# lr can be a pd.Series or a pd.DataFrame (each column is one series),
+# the value of a window is at its last day, like pd.DataFrame.rolling
+
+
+# function rolling_sr (yearly sharpe ratio of each window)
+# use log risk-free rate to get the excess return if lrf is provided
+def rolling_sr(lr, window, lrf=None, periods=252):
+    import numpy as np
+    if lrf is not None:
+        excess = lr.sub(lrf, axis=0)
+        mean = lr.rolling(window).mean().sub(lrf.rolling(window).mean(),
+                                             axis=0)
+        return mean/excess.rolling(window).std()*np.sqrt(periods)
+    rolling = lr.rolling(window)
+    return rolling.mean()/rolling.std()*np.sqrt(periods)
+
+
+# function rolling_var (value at risk of each window)
+# with confindence level 0.95
+def rolling_var(lr, window, min_periods=None):
+    return rolling_var_es(lr, window, min_periods)[0]
+
+
+# function rolling_es (expected shortfall of each window)
+# with confindence level 0.95
+def rolling_es(lr, window, min_periods=None):
+    return rolling_var_es(lr, window, min_periods)[1]
+
+
+# function rolling_var_es (value at risk and expected shortfall of each
+# window in one pass)
+# with confindence level 0.95
+def rolling_var_es(lr, window, min_periods=None, chunk=2**22):
+    """
+    the windows are sorted as a sliding window view (np.sort in chunks of
+    about chunk values), var is the k-th smallest value of a window and es
+    the mean of the k smallest, k = count - ceil(count*0.95) + 1.
+    O(n w log w) in compiled code, no loop over the days
+    return [var, es]
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    array_lr, wrap = _as_columns(lr)
+    if min_periods is None:
+        min_periods = window
+    T, K = array_lr.shape
+    valid = ~np.isnan(array_lr)
+    n_obs = np.cumsum(valid, axis=0)
+    n_obs[window:] -= n_obs[:-window].copy()
+    k = n_obs - np.ceil(n_obs*0.95).astype(int) + 1
+    # missing values and the days before the first day sort last
+    padded = np.concatenate([np.full((window-1, K), np.inf),
+                             np.where(valid, array_lr, np.inf)])
+    # (T, K, window), the window of a day ends at it
+    windows = sliding_window_view(padded, window, axis=0)
+    value_at_risk = np.empty((T, K))
+    expected_shortfall = np.empty((T, K))
+    step = max(1, chunk // (window*K))
+    for a in range(0, T, step):
+        block = np.sort(windows[a:a+step], axis=-1)
+        kth = (k[a:a+step] - 1)[..., None]
+        value_at_risk[a:a+step] = np.take_along_axis(block, kth, axis=-1)[
+            ..., 0]
+        np.cumsum(block, axis=-1, out=block)
+        expected_shortfall[a:a+step] = np.take_along_axis(
+            block, kth, axis=-1)[..., 0]/k[a:a+step]
+    enough = n_obs >= max(min_periods, 1)
+    value_at_risk[~enough] = np.nan
+    expected_shortfall[~enough] = np.nan
+    return [wrap(value_at_risk), wrap(expected_shortfall)]
+
+
+# function rolling_maxdrawdown (max percentage drawdown of each window)
+# (not log returns here)
+def rolling_maxdrawdown(lr, window, min_periods=None):
+    """
+    van Herk / Gil-Werman sliding window: cut the days into blocks of
+    window days, a window is the suffix of one block and the prefix of the
+    next one. keep (max, min, max drawdown) of the cumulative log return
+    for the prefixes and suffixes of each block, O(n) for each column
+    """
+    import numpy as np
+    array_lr, wrap = _as_columns(lr)
+    if min_periods is None:
+        min_periods = window
+    T, K = array_lr.shape
+    valid = ~np.isnan(array_lr)
+    clr = np.where(valid, np.nancumsum(array_lr, axis=0), np.nan)
+    n_block = -(-T // window)
+    blocks = np.pad(clr, ((0, n_block*window - T), (0, 0)),
+                    constant_values=np.nan).reshape(n_block, window, K)
+    # prefix of each block, missing values are skipped by fmax and fmin
+    pre_max = np.fmax.accumulate(blocks, axis=1)
+    pre_dd = np.fmin.accumulate(blocks - pre_max, axis=1)
+    # suffix of each block
+    reverse = blocks[:, ::-1]
+    suf_max = np.fmax.accumulate(reverse, axis=1)[:, ::-1]
+    suf_min = np.fmin.accumulate(reverse, axis=1)[:, ::-1]
+    suf_dd = np.fmin.accumulate((suf_min - blocks)[:, ::-1], axis=1)[:, ::-1]
+    pre_max, pre_dd = pre_max.reshape(-1, K), pre_dd.reshape(-1, K)
+    suf_max, suf_dd = suf_max.reshape(-1, K), suf_dd.reshape(-1, K)
+    pre_min = np.fmin.accumulate(blocks, axis=1).reshape(-1, K)
+    end = np.arange(window-1, T)
+    start = end - window + 1
+    with np.errstate(invalid='ignore'):
+        log_dd = np.fmin(np.fmin(suf_dd[start], pre_dd[end]),
+                         pre_min[end] - suf_max[start])
+    aligned = start % window == 0
+    log_dd[aligned] = pre_dd[end[aligned]]
+    n_obs = np.cumsum(valid, axis=0)
+    n_obs[window:] -= n_obs[:-window].copy()
+    result = np.full((T, K), np.nan)
+    result[end] = np.expm1(log_dd)
+    result[n_obs < max(min_periods, 1)] = np.nan
+    if min_periods < window:
+        # windows shorter than window at the beginning
+        head = np.fmin.accumulate(clr[:window-1] -
+                                  np.fmax.accumulate(clr[:window-1], axis=0),
+                                  axis=0)
+        result[:window-1] = np.where(n_obs[:window-1] >= max(min_periods, 1),
+                                     np.expm1(head), np.nan)
+    return wrap(result)
+
+
+def _as_columns(lr):
+    """
+    lr as a 2-D np.ndarray, and a function to wrap the result back
+    """
+    import numpy as np
+    import pandas as pd
+    if isinstance(lr, pd.Series):
+        return [lr.to_numpy(dtype=float)[:, None],
+                lambda x: pd.Series(x[:, 0], index=lr.index, name=lr.name)]
+    if isinstance(lr, pd.DataFrame):
+        return [lr.to_numpy(dtype=float),
+                lambda x: pd.DataFrame(x, index=lr.index, columns=lr.columns)]
+    array_lr = np.asarray(lr, dtype=float)
+    if array_lr.ndim == 1:
+        return [array_lr[:, None], lambda x: x[:, 0]]
+    return [array_lr, lambda x: x]
+
+
 # function performance
-def performance(lr):
+def performance(lr, periods=252):
     import pandas as pd
-    t = pd.DataFrame([yearlyreturn(lr), sr(lr), var(lr), es(lr),
-                      maxdrawdown(lr)])
+    t = pd.DataFrame([yearlyreturn(lr, periods), sr(lr, periods), var(lr),
+                      es(lr), maxdrawdown(lr)])
     t.index = ['yearly return', 'sharpe ratio', 'VaR', 'ES', 'maxdrawdown']
     t.columns = ['performance']
     return t.T
 
 
 # function performance1
-def performance1(lr, lrf):
+def performance1(lr, lrf, periods=252):
     import pandas as pd
-    t = pd.DataFrame([exesssyearlyreturn(lr, lrf), srf(lr, lrf), var(lr),
-                      es(lr), avedrawdown(lr), maxdrawdown(lr)])
+    t = pd.DataFrame([exesssyearlyreturn(lr, lrf, periods),
+                      srf(lr, lrf, periods), var(lr), es(lr),
+                      avedrawdown(lr), maxdrawdown(lr)])
     t.index = ['annualized excess return', 'Sharpe ratio',
                'VaR', 'ES', 'Avg.  DD', 'MDD']
     t.columns = ['performance']
@@ -200,27 +512,244 @@ def performance1(lr, lrf):
 
 
 # function performance2
-def performance2(lr, lrf):
+def performance2(lr, lrf, periods=12):
     import pandas as pd
-    t = pd.DataFrame([exesssyearlyreturnm(lr, lrf), srfm(lr, lrf), var(lr),
-                      es(lr), avedrawdown(lr), maxdrawdown(lr)])
+    t = pd.DataFrame([exesssyearlyreturnm(lr, lrf, periods),
+                      srfm(lr, lrf, periods), var(lr), es(lr),
+                      avedrawdown(lr), maxdrawdown(lr)])
     t.index = ['annualized excess return', 'Sharpe ratio',
                'VaR', 'ES', 'Avg.  DD', 'MDD']
     t.columns = ['performance']
     return t.T
+
+
+# function performance_table
+# the metrics of performance (lrf is None) or performance1 / performance2
+# (periods=252 / 12) for every column of lr in one pass
+def performance_table(lr, lrf=None, periods=252):
+    """
+    return the performances of many log returns, one row for each column
+      - lr: log returns, pd.DataFrame, pd.Series or np.ndarray (T, columns)
+      - lrf: log risk-free rate, (T,) or one for each column (T, columns),
+          if None, return the metrics of performance, else the metrics of
+          performance1 / performance2
+      - periods: number of periods in one year, 252 for daily returns and
+          12 for monthly returns
+    VaR and ES come from one partial sort (np.partition) of each column,
+    average and max drawdown share one cumulative sum.
+    """
+    import numpy as np
+    import pandas as pd
+    if isinstance(lr, pd.Series):
+        lr = lr.to_frame()
+    if isinstance(lr, pd.DataFrame):
+        names = lr.columns
+        array_lr = lr.to_numpy(dtype=float)
+    else:
+        array_lr = np.asarray(lr, dtype=float)
+        if array_lr.ndim == 1:
+            array_lr = array_lr[:, None]
+        names = range(array_lr.shape[1])
+    missing = np.isnan(array_lr)
+    count = (~missing).sum(axis=0)
+    mean = np.nanmean(array_lr, axis=0)
+    # sharpe ratio
+    if lrf is None:
+        yearly = mean*periods
+        s = np.nanstd(array_lr, axis=0, ddof=1)
+    else:
+        array_lrf = np.asarray(lrf, dtype=float).reshape(len(array_lr), -1)
+        yearly = (mean - np.nanmean(array_lrf, axis=0))*periods
+        s = np.nanstd(array_lr - array_lrf, axis=0, ddof=1)
+    sharpe = yearly/periods/s*np.sqrt(periods)
+    # VaR and ES with confindence level 0.95, the k-th smallest value and
+    # the mean of values not larger than it
+    k = count - np.ceil(count*0.95).astype(int)
+    value_at_risk = np.full(len(count), np.nan)
+    expected_shortfall = np.full(len(count), np.nan)
+    filled = np.where(missing, np.inf, array_lr)
+    for a_k in np.unique(k[count > 0]):
+        cols = np.flatnonzero((k == a_k) & (count > 0))
+        part = np.partition(filled[:, cols], a_k, axis=0)
+        value_at_risk[cols] = part[a_k]
+        expected_shortfall[cols] = part[:a_k+1].mean(axis=0)
+    # drawdown
+    clr = np.nancumsum(array_lr, axis=0)
+    clr_max = np.maximum.accumulate(np.where(missing, -np.inf, clr), axis=0)
+    log_drawdown = np.where(missing, np.nan, clr - clr_max)
+    with np.errstate(all='ignore'):
+        max_drawdown = np.expm1(np.nanmin(log_drawdown, axis=0))
+        ave_drawdown = np.nanmean(np.expm1(log_drawdown), axis=0)
+    if lrf is None:
+        t = {'yearly return': yearly, 'sharpe ratio': sharpe,
+             'VaR': value_at_risk, 'ES': expected_shortfall,
+             'maxdrawdown': max_drawdown}
+    else:
+        t = {'annualized excess return': yearly, 'Sharpe ratio': sharpe,
+             'VaR': value_at_risk, 'ES': expected_shortfall,
+             'Avg.  DD': ave_drawdown, 'MDD': max_drawdown}
+    return pd.DataFrame(t, index=names)
 # ----------------------------------------------------------------------------
 
 
 # function portfolio_risk
+# data_corr can be a pd.DataFrame or np.ndarray (e.g. one date of CorrCube)
 def portfolio_risk(data_corr, data_vol, data_ratio):
     import numpy as np
-    array_corr = data_corr.to_numpy()
+    array_corr = np.asarray(data_corr, dtype=float)
     array_vol = np.diag(data_vol)
     array_cov = np.dot(np.dot(array_vol, array_corr), array_vol)
     array_ratio = np.array(data_ratio)
     return np.sqrt(
         np.dot(np.dot(array_ratio, array_cov), array_ratio.transpose())
     )
+
+
+# function portfolio_risk_batch
+# stacked version of portfolio_risk, one observation per row
+def portfolio_risk_batch(array_corr, array_vol, array_ratio):
+    """
+    return the portfolio risk of every observation at once
+      - array_corr: correlation matrices, shape (T, N, N), or a CorrCube
+      - array_vol: volatility of assets, shape (T, N)
+      - array_ratio: ratio of assets, shape (T, N)
+    """
+    import numpy as np
+    array_corr = np.asarray(array_corr, dtype=float)
+    # diag(vol)*corr*diag(vol) is the same as scaling the ratio by vol
+    array_w = (np.asarray(array_vol, dtype=float) *
+               np.asarray(array_ratio, dtype=float))
+    return np.sqrt(
+        np.einsum('ti,tij,tj->t', array_w, array_corr, array_w)
+    )
+# ----------------------------------------------------------------------------
+
+
+# function risk_parity_ratio
+# cyclical coordinate descent on stacked covariance matrices, see
+# Griveau-Billion, Richard and Roncalli (2013), "A Fast Algorithm for
+# Computing High-dimensional Risk Parity Portfolios"
+def risk_parity_ratio(array_cov, budget=None, ratio_init=None, tol=1e-10,
+                      max_iter=1000, warm_start=False, warm_block=1):
+    """
+    return the risk parity (risk budgeting) ratio of every observation
+      - array_cov: covariance matrices, shape (T, N, N)
+      - budget: risk budget of assets, shape (N,) or (T, N), default equal
+      - ratio_init: initial ratio, shape (N,) or (T, N), default inverse
+          volatility
+      - tol: max difference between risk contribution share and budget
+      - max_iter: max number of coordinate descent sweeps
+      - warm_start: if False, all observations are solved together as one
+          batch. if True, solve in order, in blocks of warm_block
+          observations (one batch each), each block starts from the
+          solution of the last observation of the previous block; the first
+          block starts from ratio_init.
+    return [ratio, info], ratio has shape (T, N), info is a dict of
+    np.ndarray for each observation: 'iterations', 'converged', 'error'
+    and 'solve_time' (seconds, shared equally by observations in a batch)
+    """
+    import numpy as np
+    array_cov = np.asarray(array_cov, dtype=float)
+    T, N = array_cov.shape[:2]
+    array_vol = np.sqrt(np.einsum('tii->ti', array_cov))
+    if budget is None:
+        budget = np.ones(N)
+    budget = np.broadcast_to(np.asarray(budget, dtype=float), (T, N))
+    budget = budget / budget.sum(axis=1, keepdims=True)
+    if ratio_init is None:
+        ratio_init = 1 / array_vol
+    ratio_init = np.broadcast_to(np.asarray(ratio_init, dtype=float), (T, N))
+    if not warm_start:
+        return _risk_parity_batch(array_cov, array_vol, budget, ratio_init,
+                                  tol, max_iter)
+    ratio = np.empty((T, N))
+    info = {'iterations': np.zeros(T, dtype=int),
+            'converged': np.zeros(T, dtype=bool),
+            'error': np.zeros(T), 'solve_time': np.zeros(T)}
+    for a in range(0, T, warm_block):
+        b = min(a + warm_block, T)
+        init = (ratio_init[a:b] if a == 0 else
+                np.broadcast_to(ratio[a-1], (b - a, N)))
+        ratio[a:b], info_block = _risk_parity_batch(
+            array_cov[a:b], array_vol[a:b], budget[a:b], init, tol, max_iter
+        )
+        for key in info:
+            info[key][a:b] = info_block[key]
+    return [ratio, info]
+
+
+def _risk_parity_batch(array_cov, array_vol, budget, ratio_init, tol,
+                       max_iter):
+    import numpy as np
+    from time import perf_counter
+    T, N = array_cov.shape[:2]
+    # y solves min 0.5*y'*cov*y - sum(budget*log(y)), ratio is y/sum(y).
+    # scale the start to unit risk, the risk of the solution
+    y = np.array(ratio_init, dtype=float)
+    y /= np.sqrt(np.einsum('ti,tij,tj->t', y, array_cov, y))[:, None]
+    iterations = np.zeros(T, dtype=int)
+    error = np.full(T, np.inf)
+    solve_time = np.zeros(T)
+    active = np.arange(T)
+    cov_a, diag_a, budget_a = array_cov, array_vol**2, budget
+    for _ in range(max_iter if T else 0):
+        start = perf_counter()
+        y_a = y[active]
+        for i in range(N):
+            # the root of diag*y_i^2 + c*y_i - budget_i = 0
+            c = (np.einsum('tj,tj->t', cov_a[:, i, :], y_a) -
+                 diag_a[:, i] * y_a[:, i])
+            y_a[:, i] = ((np.sqrt(c*c + 4*diag_a[:, i]*budget_a[:, i]) - c) /
+                         (2*diag_a[:, i]))
+        y[active] = y_a
+        contribution = y_a * np.einsum('tij,tj->ti', cov_a, y_a)
+        contribution /= contribution.sum(axis=1, keepdims=True)
+        error[active] = np.abs(contribution - budget_a).max(axis=1)
+        iterations[active] += 1
+        solve_time[active] += (perf_counter() - start) / len(active)
+        unfinished = error[active] >= tol
+        if not unfinished.any():
+            break
+        if not unfinished.all():
+            active = active[unfinished]
+            cov_a = array_cov[active]
+            diag_a = array_vol[active]**2
+            budget_a = budget[active]
+    info = {'iterations': iterations, 'converged': error < tol,
+            'error': error, 'solve_time': solve_time}
+    return [y / y.sum(axis=1, keepdims=True), info]
+
+
+# function segment_cumsum
+# cumulative sum restarted at the start of each segment (reset period),
+# missing values are skipped like pd.DataFrame.cumsum
+def segment_cumsum(data, starts, initial=None, out=None):
+    """
+    return the cumulative sum of data along axis 0, restarted at each
+    position in starts (sorted)
+      - initial: rows before starts[0] go on from initial
+      - out: output array, can be data itself to compute in place
+    """
+    import numpy as np
+    data = np.asarray(data, dtype=float)
+    if out is None:
+        out = np.empty_like(data)
+    missing = np.isnan(data)
+    has_missing = missing.any()
+    starts = np.asarray(starts, dtype=int)
+    bounds = np.unique(np.concatenate([[0], starts[starts < len(data)],
+                                       [len(data)]]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if has_missing:
+            np.nancumsum(data[start:end], axis=0, out=out[start:end])
+        else:
+            np.cumsum(data[start:end], axis=0, out=out[start:end])
+    if initial is not None:
+        first = starts[0] if len(starts) else len(data)
+        out[:first] += initial
+    if has_missing:
+        out[missing] = np.nan
+    return out
 # ----------------------------------------------------------------------------
 
 
@@ -0,0 +1,139 @@
+__all__ = ['load_frame', 'load_corr', 'clear_cache']
+
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .class_corr import CorrCube
+from .customized_exceptions import DataFrameError
+
+
+# change it when the layout of cache files changes
+cache_version = 1
+
+
+def load_frame(path, cache_dir=None, mmap=True):
+    """
+    load a csv of tool9 layout (logr, risk, rf, dataset3, ...): first
+    column be date, other columns be numbers.
+    the csv is parsed once and cached as .npy files, later loads map the
+    cache files into memory. the cache is built again if the csv changes
+    (size or modified time).
+      - cache_dir: directory of cache files, default '.tool9_cache' next to
+          the csv. if it can not be written (e.g. a read-only directory),
+          the csv is parsed without cache.
+      - mmap: memory-map the cache (read only), else read it into memory.
+    return pd.DataFrame with datetime index, same as
+    pd.read_csv(path, parse_dates=['Date'], index_col='Date')
+    """
+    values, dates, meta = _cached(path, cache_dir, 'frame', mmap)
+    index = pd.DatetimeIndex(dates, name=meta['index_name'])
+    return pd.DataFrame(values, index=index, columns=meta['columns'],
+                        copy=False)
+
+
+def load_corr(path, cache_dir=None, mmap=True, triu=False):
+    """
+    load a csv of corr layout: first column be date, second column be
+    asset name, other columns be assets. cached as load_frame.
+    return CorrCube, its values are the memory map if mmap and not triu
+    """
+    values, dates, meta = _cached(path, cache_dir, 'corr', mmap)
+    return CorrCube(values, pd.DatetimeIndex(dates), meta['columns'],
+                    triu=triu)
+
+
+def clear_cache(path, cache_dir=None):
+    """
+    remove the cache files of path
+    """
+    for name in _cache_files(path, cache_dir).values():
+        if name.exists():
+            name.unlink()
+
+
+def _cache_files(path, cache_dir):
+    path = Path(path).resolve()
+    if cache_dir is None:
+        cache_dir = path.parent / '.tool9_cache'
+    key = hashlib.blake2b(str(path).encode(), digest_size=8).hexdigest()
+    stem = Path(cache_dir) / '{}-{}'.format(path.stem, key)
+    return {'meta': stem.with_suffix('.json'),
+            'values': Path(str(stem) + '-values.npy'),
+            'dates': Path(str(stem) + '-dates.npy')}
+
+
+def _cached(path, cache_dir, kind, mmap=True):
+    """
+    return [values, dates, meta] of path from the cache, parse and cache it
+    if needed. if the cache can not be written, the parsed arrays are
+    returned.
+    """
+    files = _cache_files(path, cache_dir)
+    stat = os.stat(path)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    try:
+        with open(files['meta']) as f:
+            meta = json.load(f)
+        if (meta['version'] == cache_version and meta['kind'] == kind and
+                meta['source'] == source and files['values'].exists() and
+                files['dates'].exists()):
+            return _load_arrays(files, mmap) + [meta]
+    except (OSError, ValueError, KeyError):
+        pass
+    values, dates, meta = _parse(path, kind)
+    meta.update({'version': cache_version, 'kind': kind, 'source': source})
+    try:
+        files['meta'].parent.mkdir(parents=True, exist_ok=True)
+        # meta is written last, a cache without meta is never used
+        _replace(files['values'], lambda f: np.save(f, values))
+        _replace(files['dates'], lambda f: np.save(f, dates))
+        _replace(files['meta'], lambda f: f.write(json.dumps(meta).encode()))
+    except OSError as e:
+        print('can not write the cache of "{}", not cached: {}'.
+              format(path, e))
+        return [values, dates.view('datetime64[ns]'), meta]
+    return _load_arrays(files, mmap) + [meta]
+
+
+def _parse(path, kind):
+    data = pd.read_csv(path)
+    dates = pd.to_datetime(data.iloc[:, 0]).to_numpy(dtype='datetime64[ns]')
+    meta = {'index_name': data.columns[0]}
+    if kind == 'frame':
+        values = data.iloc[:, 1:].to_numpy(dtype=float)
+        meta['columns'] = list(data.columns[1:])
+        return [values, dates.view('int64'), meta]
+    columns = list(data.columns[2:])
+    n = len(columns)
+    if len(data) % n or list(data.iloc[:n, 1]) != columns:
+        raise DataFrameError('"{}" is not a stack of square matrices'.
+                             format(path))
+    values = data.iloc[:, 2:].to_numpy(dtype=float).reshape(-1, n, n)
+    meta['columns'] = columns
+    return [values, dates[::n].view('int64'), meta]
+
+
+def _replace(name, write):
+    """
+    write a file to a temporary name, then rename it
+    """
+    temporary = name.with_name(name.name + '.{}.tmp'.format(os.getpid()))
+    try:
+        with open(temporary, 'wb') as f:
+            write(f)
+        os.replace(temporary, name)
+    except OSError:
+        if temporary.exists():
+            temporary.unlink()
+        raise
+
+
+def _load_arrays(files, mmap):
+    mode = 'r' if mmap else None
+    values = np.load(files['values'], mmap_mode=mode)
+    dates = np.load(files['dates'], mmap_mode=mode)
+    return [values, np.asarray(dates).view('datetime64[ns]')]
@@ -0,0 +1,125 @@
+__all__ = ['month_interval', 'reset_calendar', 'clear_reset_calendar']
+
+
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+
+
+# computed calendars, shared by all RRP in this process
+_cache = OrderedDict()
+# max number of calendars in _cache
+cache_size = 256
+# _cache is used from the threads of RRPService
+_lock = threading.Lock()
+
+
+def month_interval(date1, date2):
+    """
+    function month_interval
+    date2 should be after date1
+    if day2 < day1, one month will be deducted
+    """
+    if date1 >= date2:
+        raise ValueError('date2 should be after date1')
+    year1 = date1.year
+    year2 = date2.year
+    month1 = date1.month
+    month2 = date2.month
+    day1 = date1.day
+    day2 = date2.day
+    return (year2-year1)*12 + (month2-month1) - (day2 < day1)
+
+
+def reset_points(first_reset_date, reset_times, reset_months, start=0):
+    """
+    the planed reset dates, every reset_months from first_reset_date
+    start: only the points from the start-th (the points after the known
+    ones, for append)
+    """
+    month_start = (first_reset_date-timedelta(days=(first_reset_date.day-1)) +
+                   DateOffset(months=start*reset_months))
+    return (pd.date_range(
+        start=month_start, periods=max(reset_times-start, 0),
+        freq='{}MS'.format(reset_months)
+    ) + timedelta(days=(first_reset_date.day-1)))
+
+
+def reset_calendar(index, first_reset_date, reset_months,
+                   reset_shift_mode='after'):
+    """
+    return the reset calendar of the trading days index, as a dict:
+      - sample_month_interval: total months in sample period.
+      - reset_times: times of reset.
+      - reset_points: pd.DatetimeIndex, the planed reset dates.
+      - reset_date: pd.DatetimeIndex, the real reset dates. if a reset point
+          is a trading day, take it, else take the first trading day after
+          (before) it. the first day is added if it is not a reset point.
+      - reset_position: np.ndarray, position of reset_date in index.
+      - reset_period: np.ndarray, for each day, the position in reset_date
+          of its last reset date.
+    all reset points are found by one sorted search over index. results are
+    cached for each (index, first_reset_date, reset_months, mode), do not
+    change them.
+    """
+    first_reset_date = pd.Timestamp(first_reset_date)
+    if reset_shift_mode in ('after', 'a', 'front', 'f'):
+        side = 'left'
+    elif reset_shift_mode in ('before', 'back', 'b'):
+        side = 'right'
+    else:
+        raise ValueError('"reset_shift_mode" should be "after" or "before"')
+    key = (_fingerprint(index), first_reset_date, reset_months, side)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    # one reset only if the first reset date is the last day
+    sample_month_interval = (month_interval(first_reset_date, index[-1])
+                             if first_reset_date < index[-1] else 0)
+    reset_times = sample_month_interval // reset_months + 1
+    points = reset_points(first_reset_date, reset_times, reset_months)
+    # from day 29-31 the last point may fall after the last day (e.g.
+    # 01-31 + 1 month is 03-02), it is a reset of the later days
+    points = points[points <= index[-1]]
+    reset_times = len(points)
+    position = index.searchsorted(points, side=side)
+    if side == 'right':
+        position = position - 1
+    # NaT if no trading day after the reset point
+    reset_date = index[np.minimum(position, len(index)-1)]. \
+        where(position < len(index)).rename(None)
+    if index[0] != first_reset_date:
+        reset_date = reset_date.insert(0, index[0])
+        position = np.insert(position, 0, 0)
+    reset_period = np.searchsorted(position, np.arange(len(index)),
+                                   side='right') - 1
+    position.flags.writeable = False
+    reset_period.flags.writeable = False
+    calendar = {'sample_month_interval': sample_month_interval,
+                'reset_times': reset_times, 'reset_points': points,
+                'reset_date': reset_date, 'reset_position': position,
+                'reset_period': reset_period}
+    with _lock:
+        _cache[key] = calendar
+        if len(_cache) > cache_size:
+            _cache.popitem(last=False)
+    return calendar
+
+
+def clear_reset_calendar():
+    """
+    remove all cached calendars
+    """
+    with _lock:
+        _cache.clear()
+
+
+def _fingerprint(index):
+    digest = hashlib.blake2b(np.ascontiguousarray(index.asi8),
+                             digest_size=16).digest()
+    return (len(index), str(index.dtype), digest)
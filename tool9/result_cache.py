@@ -0,0 +1,207 @@
+__all__ = ['cached_result', 'result_key', 'clear_result_cache']
+
+
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import numpy as np
+import pandas as pd
+from .class_corr import CorrCube
+from .class_result import RRPResult
+from .class_rrp import RRP
+from .customized_exceptions import InputError
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, eviction is not locked there
+    fcntl = None
+
+
+# change it when the outputs of RRP change, the layout of files is
+# RRPResult.save
+result_cache_version = 1
+
+# default directory of the cache, relative to the working directory, set
+# by the environment variable TOOL9_RESULT_CACHE or by assigning it
+result_cache_dir = os.environ.get('TOOL9_RESULT_CACHE',
+                                  '.tool9_cache/results')
+
+# inputs of RRP hashed by their values
+frame_inputs = ('logr', 'risk', 'corr', 'r_rolling', 'rf_rolling')
+
+# inputs of RRP that do not change the outputs
+ignored_inputs = ('compact', 'profile', 'profile_callback', 'memo')
+
+
+def cached_result(cache_dir=None, max_bytes=2**30, mmap=True,
+                  dtype='float64', **kw):
+    """
+    RRP(**kw).result(dtype), kept on disk and used again by later calls with
+    the same inputs (by value) and arguments, in any process.
+      - cache_dir: directory of the cache, one sub directory for each
+          result, the outputs in .npy files. default result_cache_dir of
+          this module.
+      - max_bytes: size of the cache, the least recently used results are
+          removed when it is larger.
+      - mmap: memory-map the outputs of a cached result (read only), else
+          read them into memory.
+      - kw: arguments of RRP.
+    return [result, hit]: result is RRPResult, hit is True if it was read
+    from the cache.
+    worker processes can share one cache_dir: a result is written to a
+    temporary directory then renamed, removing results is locked.
+    """
+    cache_dir = Path(result_cache_dir if cache_dir is None else cache_dir)
+    key = result_key(dtype=dtype, **kw)
+    entry = cache_dir / key
+    try:
+        result = RRPResult.load(entry, mmap)
+        # the modified time of meta is the time of last use
+        os.utime(entry / 'meta.json')
+        return [result, True]
+    except (OSError, ValueError, KeyError):
+        pass
+    result = RRP(**kw).result(dtype=dtype)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temporary = cache_dir / '{}.{}.tmp'.format(key, os.getpid())
+    result.save(temporary)
+    try:
+        os.rename(temporary, entry)
+    except OSError:
+        # written by another process at the same time
+        shutil.rmtree(temporary, ignore_errors=True)
+    _evict(cache_dir, max_bytes, keep=key)
+    return [result, False]
+
+
+def result_key(**kw):
+    """
+    the hex key of the arguments of RRP (and dtype) in the result cache.
+    pd.DataFrame and CorrCube inputs are hashed by index, columns and
+    values, other arguments by their json.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(result_cache_version).encode())
+    params = {}
+    for name in sorted(kw):
+        value = kw[name]
+        if name in ignored_inputs or value is None:
+            continue
+        if name in frame_inputs:
+            h.update(name.encode())
+            _hash_input(h, value)
+        else:
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            elif isinstance(value, (pd.Timestamp, str)) and \
+                    name == 'first_reset_date':
+                value = str(pd.Timestamp(value))
+            params[name] = value
+    try:
+        h.update(json.dumps(params, sort_keys=True).encode())
+    except TypeError:
+        raise InputError('arguments of RRP can not be hashed: {}'.
+                         format(sorted(params)))
+    return h.hexdigest()
+
+
+def clear_result_cache(cache_dir=None):
+    """
+    remove all results in cache_dir, default result_cache_dir
+    """
+    cache_dir = Path(result_cache_dir if cache_dir is None else cache_dir)
+    with _locked(cache_dir):
+        for entry in _entries(cache_dir):
+            _remove(entry)
+
+
+def _hash_input(h, value):
+    if isinstance(value, CorrCube):
+        h.update(b'CorrCube' + str(value.triu).encode())
+        h.update(json.dumps(value.columns).encode())
+        index = value.index
+        values = value.values
+    else:
+        h.update(json.dumps([str(c) for c in value.columns]).encode())
+        index = value.index
+        values = value.to_numpy(dtype=float)
+    if isinstance(index, pd.MultiIndex):
+        for i in range(index.nlevels):
+            level = index.get_level_values(i)
+            _hash_array(h, level.asi8 if i == 0 else
+                        np.asarray(level.astype(str), dtype='U'))
+    else:
+        _hash_array(h, index.asi8)
+    _hash_array(h, np.asarray(values, dtype=float))
+
+
+def _hash_array(h, array):
+    array = np.ascontiguousarray(array)
+    h.update(str((array.dtype.str, array.shape)).encode())
+    h.update(memoryview(array).cast('B'))
+
+
+def _entries(cache_dir):
+    if not cache_dir.exists():
+        return []
+    return [entry for entry in cache_dir.iterdir()
+            if entry.is_dir() and not entry.name.endswith('.tmp')]
+
+
+def _size(entry):
+    return sum(f.stat().st_size for f in entry.iterdir())
+
+
+def _evict(cache_dir, max_bytes, keep):
+    """
+    remove the least recently used results until the cache is not larger
+    than max_bytes, the result keep is not removed
+    """
+    with _locked(cache_dir):
+        used = []
+        for entry in _entries(cache_dir):
+            try:
+                used.append([(entry / 'meta.json').stat().st_mtime_ns,
+                             _size(entry), entry])
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in used)
+        for _, size, entry in sorted(used, key=lambda x: x[0]):
+            if total <= max_bytes:
+                break
+            if entry.name != keep:
+                _remove(entry)
+                total -= size
+
+
+def _remove(entry):
+    """
+    rename then remove, so other processes never read half of a result.
+    memory maps of its files stay valid.
+    """
+    removed = entry.with_name('{}.{}.removed.tmp'.format(entry.name,
+                                                         os.getpid()))
+    try:
+        os.rename(entry, removed)
+    except OSError:
+        return
+    shutil.rmtree(removed, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _locked(cache_dir):
+    """
+    an exclusive lock of cache_dir between processes
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_dir / '.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,70 @@
+__all__ = ['reset_sensitivity']
+
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+from .class_rrp import RRP
+from .func import performance_table, segment_cumsum
+from .reset_calendar import reset_calendar
+from .customized_exceptions import InputError
+
+
+def reset_sensitivity(first_reset_dates=None, lrf=None, periods=252, **kw):
+    """
+    RRP with each first_reset_date, to see how much the results depend on
+    the timing of reset
+      - first_reset_dates: list of dates, default every trading day of the
+          first reset_months (all phase offsets of the reset calendar).
+      - lrf: log risk-free rate for the metrics of performance1, pd.Series
+          with the same index as logr, default 0.
+      - periods: number of periods in one year for the metrics.
+      - kw: other arguments of RRP (logr, reset_months, reset_shift_mode,
+          risk, corr, target_risk, ...), get_actual is not used.
+    return [logr_p, metrics]: logr_p is pd.DataFrame, one column for each
+    first_reset_date. metrics is pd.DataFrame, one row for each
+    first_reset_date, the columns of performance1 and 'out of money'.
+    ratio and leverage of a reset date do not depend on the other reset
+    dates, they are computed once for all days and shared by all offsets.
+    """
+    if 'first_reset_date' in kw:
+        raise InputError('use "first_reset_dates" instead of '
+                         '"first_reset_date"')
+    kw['get_actual'] = False
+    p = RRP(**kw)
+    index = p.index
+    if first_reset_dates is None:
+        end = index[0] + DateOffset(months=p.reset_months)
+        first_reset_dates = index[index < end]
+    first_reset_dates = pd.DatetimeIndex(first_reset_dates)
+    if (first_reset_dates < index[0]).any():
+        raise InputError('"first_reset_dates" must be later than the first '
+                         'day')
+    # ratio and leverage if each day were a reset date
+    ratio_all = p.ratio_at(index)[0]
+    leverage_all = p.leverage_at(index, ratio_all)
+    asset_logr = p.logr.to_numpy(dtype=float)
+    logr_p = np.empty((len(index), len(first_reset_dates)))
+    out_of_money = np.zeros(len(first_reset_dates), dtype=bool)
+    for i, first_reset_date in enumerate(first_reset_dates):
+        calendar = reset_calendar(index, first_reset_date, p.reset_months,
+                                  p.reset_shift_mode)
+        position = calendar['reset_position']
+        reset_rows = np.unique(position[position < len(index)])
+        # for each day, the row of its reset date
+        reset_of_day = reset_rows[np.searchsorted(
+            reset_rows, np.arange(len(index)), side='right') - 1]
+        r_actual_cum = segment_cumsum(asset_logr, reset_rows)
+        np.expm1(r_actual_cum, out=r_actual_cum)
+        r_actual_cum *= ratio_all[reset_of_day]
+        r_actual_cum *= leverage_all[reset_of_day, None]
+        r_p_cum = np.nansum(r_actual_cum, axis=1)
+        out_of_money[i] = (r_p_cum < -1).any()
+        logr_p[:, i] = RRP.logr_p_of_cum(r_p_cum, reset_rows)
+    logr_p = pd.DataFrame(logr_p, index=index, columns=first_reset_dates)
+    if lrf is None:
+        lrf = np.zeros(len(index))
+    metrics = performance_table(logr_p, lrf, periods=periods)
+    metrics.index.name = 'first_reset_date'
+    metrics['out of money'] = out_of_money
+    return [logr_p, metrics]
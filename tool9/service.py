@@ -0,0 +1,262 @@
+"""
+a long-running local service keeping RRP instances in memory
+
+python -m tool9.service --socket /tmp/tool9.sock
+python -m tool9.service --port 8765
+
+protocol: one json object for each line, one json answer for each line,
+{"ok": true, "result": ...} or {"ok": false, "error": "..."}. operations
+("op") and their keys:
+  - load: name, inputs (input name: csv path, corr in corr layout), params
+      (other arguments of RRP). construct the portfolio name.
+  - list: the names and the last day of each portfolio.
+  - get: name, output (e.g. "leverage", "risk_p_actual"), last (number of
+      last days, default 1, 0 for all).
+  - performance: name, last (number of last days, default all).
+  - whatif: name, params. construct a new portfolio with the params
+      changed, return its last leverage and performance, the portfolio
+      name is not changed.
+  - set: name, params. change the params of portfolio name in place, only
+      the stages depending on them are computed.
+  - push: name, index (new dates), logr, risk, r_rolling, rf_rolling (rows
+      of values), corr (one matrix for each date). RRP.append. all the
+      inputs the portfolio uses are needed, a bad push changes nothing.
+  - drop: name.
+"""
+__all__ = ['RRPService', 'request']
+
+
+import argparse
+import asyncio
+import json
+import socket
+import numpy as np
+import pandas as pd
+from .class_rrp import RRP
+from .func import performance1
+from .loader import load_frame, load_corr
+from .customized_exceptions import InputError
+
+
+class RRPService(object):
+    """
+    RRP instances by name, and the operations of the protocol
+      - service.handle(message) answers one message (dict) in this thread.
+      - await service.start(path=..., host=..., port=...) serves clients.
+    operations of one portfolio run one at a time, other portfolios and
+    reads of the list go on.
+    """
+
+    outputs = ('logr_p', 'ratio', 'ratio_actual', 'leverage', 'risk_p',
+               'risk_p_actual', 'ratio_solve_info')
+
+    def __init__(self):
+        self.portfolios = {}
+        self.__params = {}
+        self.__inputs = {}
+        self.__locks = {}
+
+    def handle(self, message):
+        """
+        answer one message, as a dict
+        """
+        try:
+            op = message.get('op')
+            method = getattr(self, 'op_' + str(op), None)
+            if method is None:
+                raise InputError('unknown op "{}"'.format(op))
+            return {'ok': True, 'result': method(message)}
+        except Exception as e:
+            return {'ok': False,
+                    'error': '{}: {}'.format(type(e).__name__, e)}
+
+    def portfolio(self, message):
+        name = message.get('name')
+        if name not in self.portfolios:
+            raise InputError('no portfolio "{}"'.format(name))
+        return self.portfolios[name]
+
+    def op_load(self, message):
+        inputs = {}
+        for key, path in message.get('inputs', {}).items():
+            if key == 'corr':
+                inputs[key] = load_corr(path)
+            else:
+                inputs[key] = load_frame(path)
+        params = dict(message.get('params', {}))
+        p = RRP(**inputs, **params)
+        name = message['name']
+        self.portfolios[name] = p
+        self.__params[name] = params
+        self.__inputs[name] = list(inputs)
+        return {'name': name, 'last_day': str(p.last_day.date())}
+
+    def op_list(self, message):
+        return {name: str(p.last_day.date())
+                for name, p in self.portfolios.items()}
+
+    def op_get(self, message):
+        p = self.portfolio(message)
+        output = message.get('output')
+        if output not in self.outputs:
+            raise InputError('unknown output "{}"'.format(output))
+        data = getattr(p, output)
+        last = message.get('last', 1)
+        if data is not None and last:
+            data = data.iloc[-last:]
+        return _to_json(data)
+
+    def op_performance(self, message):
+        p = self.portfolio(message)
+        logr_p = p.logr_p['portfolio']
+        if message.get('last'):
+            logr_p = logr_p.iloc[-message['last']:]
+        return _metrics(logr_p)
+
+    def op_whatif(self, message):
+        p = self.portfolio(message)
+        name = message['name']
+        kw = {key: getattr(p, key) for key in self.__inputs[name]}
+        kw.update(self.__params[name])
+        kw.update(message.get('params', {}))
+        q = RRP(**kw)
+        return {'leverage': float(q.leverage['leverage'].iloc[-1]),
+                'performance': _metrics(q.logr_p['portfolio'])}
+
+    def op_set(self, message):
+        p = self.portfolio(message)
+        for key, value in message.get('params', {}).items():
+            if not hasattr(p, 'new_' + key):
+                raise InputError('can not set "{}"'.format(key))
+            getattr(p, 'new_' + key)(value)
+            self.__params[message['name']][key] = value
+        return {'leverage': float(p.leverage['leverage'].iloc[-1])}
+
+    def op_push(self, message):
+        p = self.portfolio(message)
+        index = pd.DatetimeIndex(message['index'])
+        # a bad push is refused before the portfolio is changed
+        used = p.append_inputs()
+        missing = [key for key in used if key not in message]
+        if missing:
+            raise InputError('push of this portfolio needs {}'.
+                             format(', '.join(missing)))
+        new = {}
+        for key in used:
+            values = np.array(message[key], dtype=float)
+            if key == 'corr':
+                shape = (len(index), len(p.logr_names), len(p.logr_names))
+            else:
+                columns = getattr(p, key).columns
+                shape = (len(index), len(columns))
+            if values.shape != shape:
+                raise InputError('"{}" should have shape {}, not {}'.
+                                 format(key, shape, values.shape))
+            new[key] = values if key == 'corr' else \
+                pd.DataFrame(values, index=index, columns=columns)
+        p.append(**new)
+        return {'last_day': str(p.last_day.date()),
+                'leverage': float(p.leverage['leverage'].iloc[-1])}
+
+    def op_drop(self, message):
+        self.portfolio(message)
+        name = message['name']
+        for data in (self.portfolios, self.__params, self.__inputs,
+                     self.__locks):
+            data.pop(name, None)
+        return {'name': name}
+
+    async def handle_async(self, message):
+        """
+        answer one message in the default executor, one at a time for
+        each portfolio
+        """
+        loop = asyncio.get_running_loop()
+        name = message.get('name') if isinstance(message, dict) else None
+        if name is None:
+            return await loop.run_in_executor(None, self.handle, message)
+        lock = self.__locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            return await loop.run_in_executor(None, self.handle, message)
+
+    async def client_connected(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError('message should be a json object')
+                except ValueError as e:
+                    answer = {'ok': False,
+                              'error': 'ValueError: {}'.format(e)}
+                else:
+                    answer = await self.handle_async(message)
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """
+        start serving on the Unix socket path, or on host:port (port 0 for
+        any free port), return the asyncio server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self.client_connected, path=path, limit=2**26
+            )
+        return await asyncio.start_server(self.client_connected, host, port,
+                                          limit=2**26)
+
+
+def request(message, path=None, host='127.0.0.1', port=None):
+    """
+    send one message to the service, return the answer (dict)
+    """
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rwb') as f:
+        f.write(json.dumps(message).encode() + b'\n')
+        f.flush()
+        return json.loads(f.readline())
+
+
+def _metrics(logr_p):
+    lrf = pd.Series(0.0, index=logr_p.index)
+    metrics = performance1(logr_p, lrf).iloc[0]
+    return {key: None if np.isnan(value) else float(value)
+            for key, value in metrics.items()}
+
+
+def _to_json(data):
+    if data is None:
+        return None
+    data = data.astype(object).where(data.notna(), None)
+    return {'index': [str(date.date()) for date in data.index],
+            'columns': [str(column) for column in data.columns],
+            'data': data.values.tolist()}
+
+
+async def _serve(path, host, port):
+    server = await RRPService().start(path=path, host=host, port=port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='tool9 RRP service')
+    parser.add_argument('--socket', help='path of the Unix socket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    asyncio.run(_serve(args.socket, args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+__all__ = ['param_grid', 'isweep', 'sweep']
+
+
+from itertools import product
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from .class_rrp import RRP
+from .class_corr import CorrCube
+from .func import performance1
+from .customized_exceptions import InputError
+
+
+# arrays of the current worker, attached from shared memory by _init_worker
+_worker = {}
+
+
+def param_grid(**kw):
+    """
+    return the list of all combinations of RRP arguments
+    e.g. param_grid(reset_months=[3, 6, 12], target_risk=[8, 10])
+    """
+    names = list(kw)
+    return [dict(zip(names, values)) for values in product(*kw.values())]
+
+
+def isweep(grid, logr, risk=None, corr=None, lrf=None, processes=None,
+           chunksize=1, result_dtype=None, **kw):
+    """
+    run RRP for each configuration in grid and yield the results one by one
+      - grid: list of dict, arguments of RRP that change, see param_grid.
+      - logr, risk, corr: inputs of RRP, shared by all configurations.
+          corr can be a MultiIndex pd.DataFrame or a CorrCube.
+      - lrf: log risk-free rate for performance1, pd.Series with the same
+          index as logr, default 0.
+      - processes: number of worker processes, default os.cpu_count().
+          if 0, run in this process.
+      - chunksize: number of configurations sent to a worker at once.
+      - result_dtype: if provided, also keep the outputs of each portfolio
+          as a RRPResult of this dtype, in 'result'.
+      - kw: other arguments of RRP, same for all configurations.
+    yield a dict for each configuration: its arguments and performance1
+    logr, risk and corr are put in shared memory once, not pickled for
+    each worker or configuration.
+    """
+    if lrf is None:
+        lrf = pd.Series(0.0, index=logr.index)
+    if isinstance(corr, pd.DataFrame):
+        corr = CorrCube.from_frame(corr)
+    arrays = {'logr': logr.to_numpy(dtype=float)}
+    if risk is not None:
+        arrays['risk'] = risk.to_numpy(dtype=float)
+    if corr is not None:
+        arrays['corr'] = corr.values
+    meta = {'index': logr.index, 'logr_names': list(logr.columns),
+            'risk_names': None if risk is None else list(risk.columns),
+            'corr_names': None if corr is None else corr.columns,
+            'corr_triu': None if corr is None else corr.triu,
+            'lrf': lrf, 'kw': kw, 'result_dtype': result_dtype}
+    if processes == 0:
+        _worker.update(_frames(arrays, meta))
+        try:
+            for params in grid:
+                yield _run_one(params)
+        finally:
+            _worker.clear()
+        return
+    blocks = {}
+    try:
+        for name, array in arrays.items():
+            blocks[name] = shared_memory.SharedMemory(
+                create=True, size=max(array.nbytes, 1)
+            )
+            np.ndarray(array.shape, dtype=float,
+                       buffer=blocks[name].buf)[...] = array
+        specs = {name: (blocks[name].name, array.shape)
+                 for name, array in arrays.items()}
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(specs, meta)) as pool:
+            for row in pool.imap(_run_one, grid, chunksize):
+                yield row
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def sweep(grid, logr, risk=None, corr=None, lrf=None, processes=None,
+          chunksize=1, result_dtype=None, **kw):
+    """
+    run RRP for each configuration in grid
+    return pd.DataFrame, one row for each configuration, columns be the
+    arguments in grid and the performance1 metrics
+    see isweep for the arguments
+    """
+    if not grid:
+        raise InputError('"grid" is empty')
+    rows = list(isweep(grid, logr, risk=risk, corr=corr, lrf=lrf,
+                       processes=processes, chunksize=chunksize,
+                       result_dtype=result_dtype, **kw))
+    return pd.DataFrame(rows)
+
+
+def _init_worker(specs, meta):
+    arrays = {}
+    for name, (block_name, shape) in specs.items():
+        # workers share the resource tracker of the parent, which unlinks
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=float, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        _worker['block_' + name] = block
+    _worker.update(_frames(arrays, meta))
+
+
+def _frames(arrays, meta):
+    frames = {'lrf': meta['lrf'], 'kw': meta['kw'],
+              'result_dtype': meta['result_dtype']}
+    frames['logr'] = pd.DataFrame(arrays['logr'], index=meta['index'],
+                                  columns=meta['logr_names'], copy=False)
+    if 'risk' in arrays:
+        frames['risk'] = pd.DataFrame(arrays['risk'], index=meta['index'],
+                                      columns=meta['risk_names'], copy=False)
+    if 'corr' in arrays:
+        frames['corr'] = CorrCube(arrays['corr'], meta['index'],
+                                  meta['corr_names'], triu=meta['corr_triu'])
+    return frames
+
+
+def _run_one(params):
+    kw = dict(_worker['kw'])
+    kw.update(params)
+    for name in ('logr', 'risk', 'corr'):
+        if name in _worker:
+            kw[name] = _worker[name]
+    p = RRP(**kw)
+    t = performance1(p.logr_p['portfolio'], _worker['lrf'])
+    row = dict(params)
+    row.update(t.iloc[0].to_dict())
+    if _worker['result_dtype'] is not None:
+        row['result'] = p.result(dtype=_worker['result_dtype'])
+    return row